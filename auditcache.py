@@ -0,0 +1,105 @@
+# Copyright (c) 2025, Arka Mondal. All rights reserved.
+# Use of this source code is governed by a BSD-style license that
+# can be found in the LICENSE file.
+
+import asyncio
+import datetime
+import time
+
+import discord
+
+
+class AuditLogCache:
+    """Short-lived cache of audit log entries keyed by (action, target id).
+
+    A miss triggers one fetch of every entry for that action since the last
+    fetch, shared by all listeners waiting on the same guild and action, so
+    a burst of channel events costs a handful of audit log requests instead
+    of one each. Entries expire after ``ttl`` seconds.
+    """
+
+    def __init__(self, ttl=60, first_page=100, max_entries=500, retry_delay=1.5):
+        self.ttl = ttl
+        self.first_page = first_page
+        self.max_entries = max_entries
+        self.retry_delay = retry_delay
+        self.hits = 0
+        self.fetches = 0
+        self._entries = {}
+        self._last_seen = {}
+        self._in_flight = {}
+
+    async def resolve(self, guild, action, target_id, since=None):
+        """Return the user behind the newest matching entry, or None.
+
+        Entries created before ``since`` are ignored so an older change to the
+        same target is never credited for a new one.
+        """
+        if since is None:
+            since = discord.utils.utcnow() - datetime.timedelta(seconds=10)
+
+        user = self._lookup(guild.id, action, target_id, since)
+        if user is not None:
+            self.hits += 1
+            return user
+
+        # the audit log entry is sometimes written a moment after the gateway
+        # event arrives, so give it one more chance
+        for delay in (0, self.retry_delay):
+            await asyncio.sleep(delay)
+            await self._refresh(guild, action)
+            user = self._lookup(guild.id, action, target_id, since)
+            if user is not None:
+                return user
+        return None
+
+    def _lookup(self, guild_id, action, target_id, since):
+        entry = self._entries.get((guild_id, action, target_id))
+        if entry is None:
+            return None
+
+        _, created_at, user, expires = entry
+        if expires < time.monotonic():
+            del self._entries[(guild_id, action, target_id)]
+            return None
+        if created_at < since:
+            return None
+        return user
+
+    async def _refresh(self, guild, action):
+        key = (guild.id, action)
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._fetch(guild, action))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        await asyncio.shield(task)
+
+    async def _fetch(self, guild, action):
+        self.fetches += 1
+        key = (guild.id, action)
+        last_seen = self._last_seen.get(key)
+        if last_seen is None:
+            entries = guild.audit_logs(limit=self.first_page, action=action)
+        else:
+            entries = guild.audit_logs(limit=self.max_entries, action=action, after=discord.Object(id=last_seen))
+
+        expires = time.monotonic() + self.ttl
+        async for entry in entries:
+            if entry.target is None:
+                continue
+
+            entry_key = (guild.id, action, entry.target.id)
+            cached = self._entries.get(entry_key)
+            if cached is None or cached[0] < entry.id:
+                self._entries[entry_key] = (entry.id, entry.created_at, entry.user, expires)
+            last_seen = max(last_seen or 0, entry.id)
+
+        if last_seen is not None:
+            self._last_seen[key] = last_seen
+        self._prune()
+
+    def _prune(self):
+        now = time.monotonic()
+        for entry_key in [k for k, v in self._entries.items() if v[3] < now]:
+            del self._entries[entry_key]
@@ -0,0 +1,160 @@
+# Copyright (c) 2025, Arka Mondal. All rights reserved.
+# Use of this source code is governed by a BSD-style license that
+# can be found in the LICENSE file.
+
+import datetime
+import gzip
+import hashlib
+import json
+import os
+import zlib
+
+BUCKETS = 256
+NAME_FORMAT = '%Y-%m-%d_%H-%M-%S'
+# length of a formatted name; snapshots taken in the same second get a
+# '-<n>' suffix after it
+NAME_LENGTH = len('2025-01-01_00-00-00')
+
+
+def _bucket_of(htbid):
+    return zlib.crc32(htbid.encode()) % BUCKETS
+
+
+def _name_order(name):
+    # '<time>-10' sorts after '<time>-9'
+    return name[:NAME_LENGTH], int(name[NAME_LENGTH + 1:] or 0)
+
+
+class BackupStore:
+    """Content-addressed, compressed, incremental snapshots of the claims.
+
+    Claims are split into a fixed number of buckets by a hash of the
+    participant id. Each bucket is stored gzipped under the SHA-256 of its
+    contents, and a snapshot is a small manifest of bucket hashes, so a
+    snapshot only writes the buckets that changed since the last one.
+
+    Retention keeps the newest snapshot of every hour for ``hourly`` hours
+    and of every day for ``daily`` days, plus every ``manual`` snapshot for
+    ``daily`` days; anything else is pruned along with the objects no
+    remaining snapshot refers to. All methods block, run them
+    on a ``FileIO`` thread.
+    """
+
+    def __init__(self, root='backup', hourly=24, daily=30):
+        self.root = root
+        self.hourly = hourly
+        self.daily = daily
+        self.objects_dir = os.path.join(root, 'objects')
+        self.snapshots_dir = os.path.join(root, 'snapshots')
+
+    def snapshot(self, claimed, now=None, manual=False, pin=()):
+        """Store ``claimed``; return ``(name, new_objects)``, name None if unchanged.
+
+        Snapshots named in ``pin`` survive the prune that follows.
+        """
+        now = now or datetime.datetime.now(datetime.UTC)
+        buckets = [{} for _ in range(BUCKETS)]
+        for htbid, user_id in claimed.items():
+            buckets[_bucket_of(htbid)][htbid] = user_id
+
+        manifest = []
+        new_objects = 0
+        for bucket in buckets:
+            data = json.dumps(bucket, sort_keys=True, separators=(',', ':')).encode()
+            digest = hashlib.sha256(data).hexdigest()
+            if self._put_object(digest, data):
+                new_objects += 1
+            manifest.append(digest)
+
+        names = self.list()
+        if names and self._read_manifest(names[-1])['buckets'] == manifest:
+            return None, 0
+
+        name = base = now.strftime(NAME_FORMAT)
+        os.makedirs(self.snapshots_dir, exist_ok=True)
+        path = os.path.join(self.snapshots_dir, f'{name}.json')
+        count = 0
+        while os.path.exists(path):
+            count += 1
+            name = f'{base}-{count}'
+            path = os.path.join(self.snapshots_dir, f'{name}.json')
+        with open(path + '.tmp', 'w') as f:
+            json.dump({'created': now.isoformat(), 'claims': len(claimed), 'manual': manual, 'buckets': manifest}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + '.tmp', path)
+
+        self.prune(now, pin)
+        return name, new_objects
+
+    def list(self):
+        """Snapshot names, oldest first."""
+        if not os.path.isdir(self.snapshots_dir):
+            return []
+        names = [name[:-len('.json')] for name in os.listdir(self.snapshots_dir) if name.endswith('.json')]
+        return sorted(names, key=_name_order)
+
+    def find(self, point):
+        """Return the newest snapshot taken at or before ``point`` (a name prefix)."""
+        candidates = [name for name in self.list() if name <= point or name.startswith(point)]
+        return candidates[-1] if candidates else None
+
+    def restore(self, name):
+        claimed = {}
+        for digest in self._read_manifest(name)['buckets']:
+            with gzip.open(self._object_path(digest), 'rb') as f:
+                claimed.update(json.loads(f.read()))
+        return claimed
+
+    def prune(self, now=None, pin=()):
+        now = now or datetime.datetime.now(datetime.UTC)
+        names = self.list()
+        keep = set(names[-1:]) | (set(pin) & set(names))
+        hours = set()
+        days = set()
+        for name in reversed(names):
+            taken = datetime.datetime.strptime(name[:NAME_LENGTH], NAME_FORMAT).replace(tzinfo=datetime.UTC)
+            age = now - taken
+            hour = name[:13]
+            day = name[:10]
+            if age <= datetime.timedelta(hours=self.hourly) and hour not in hours:
+                hours.add(hour)
+                keep.add(name)
+            if age <= datetime.timedelta(days=self.daily) and day not in days:
+                days.add(day)
+                keep.add(name)
+            if age <= datetime.timedelta(days=self.daily) and name not in keep \
+                    and self._read_manifest(name).get('manual'):
+                keep.add(name)
+
+        for name in names:
+            if name not in keep:
+                os.remove(os.path.join(self.snapshots_dir, f'{name}.json'))
+
+        referenced = set()
+        for name in keep:
+            referenced.update(self._read_manifest(name)['buckets'])
+        if not os.path.isdir(self.objects_dir):
+            return
+        for prefix in os.listdir(self.objects_dir):
+            prefix_dir = os.path.join(self.objects_dir, prefix)
+            for digest in os.listdir(prefix_dir):
+                if digest not in referenced:
+                    os.remove(os.path.join(prefix_dir, digest))
+
+    def _object_path(self, digest):
+        return os.path.join(self.objects_dir, digest[:2], digest)
+
+    def _put_object(self, digest, data):
+        path = self._object_path(digest)
+        if os.path.exists(path):
+            return False
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with gzip.open(path + '.tmp', 'wb') as f:
+            f.write(data)
+        os.replace(path + '.tmp', path)
+        return True
+
+    def _read_manifest(self, name):
+        with open(os.path.join(self.snapshots_dir, f'{name}.json')) as f:
+            return json.load(f)
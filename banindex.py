@@ -0,0 +1,66 @@
+# Copyright (c) 2025, Arka Mondal. All rights reserved.
+# Use of this source code is governed by a BSD-style license that
+# can be found in the LICENSE file.
+
+
+class BanIndex:
+    """Local copy of a guild's ban list for lookups by user id or name.
+
+    Loaded once by paging through the ban list, then kept current from ban
+    and unban events, so searching it never touches the API.
+    """
+
+    def __init__(self):
+        self.ready = False
+        self._bans = {}
+        self._removed = None
+
+    def __len__(self):
+        return len(self._bans)
+
+    async def load(self, guild):
+        bans = {}
+        self._removed = set()
+        try:
+            async for ban in guild.bans(limit=None):
+                bans[ban.user.id] = (str(ban.user), ban.reason)
+
+            # events that arrived while paging are newer than the pages
+            for user_id in self._removed:
+                bans.pop(user_id, None)
+            bans.update(self._bans)
+        finally:
+            self._removed = None
+
+        self._bans = bans
+        self.ready = True
+
+    def add(self, user, reason=None):
+        self._bans[user.id] = (str(user), reason)
+
+    def remove(self, user_id):
+        self._bans.pop(user_id, None)
+        if self._removed is not None:
+            self._removed.add(user_id)
+
+    def get(self, user_id):
+        return self._bans.get(user_id)
+
+    def search(self, query, limit=20):
+        """Return ``(user_id, name, reason)`` for bans matching ``query``.
+
+        A numeric query matches the user id exactly, anything else matches
+        case-insensitively anywhere in the user name.
+        """
+        if query.isdigit():
+            ban = self._bans.get(int(query))
+            return [(int(query), *ban)] if ban else []
+
+        query = query.lower()
+        matches = []
+        for user_id, (name, reason) in self._bans.items():
+            if query in name.lower():
+                matches.append((user_id, name, reason))
+                if len(matches) == limit:
+                    break
+        return matches
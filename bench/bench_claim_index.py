@@ -0,0 +1,72 @@
+# Copyright (c) 2025, Arka Mondal. All rights reserved.
+# Use of this source code is governed by a BSD-style license that
+# can be found in the LICENSE file.
+
+"""Micro-benchmark for the claim lookups done by htbverify.
+
+Runs the same checks htbverify makes before granting the role (reverse
+claim check, forward claim check, claim) against claim stores of growing
+size, once with ClaimIndex and once with the old ``in claimed.values()``
+scan for comparison.
+
+    python bench/bench_claim_index.py [sizes...]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from claimstore import ClaimIndex
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000, 500_000]
+ATTEMPTS = 2_000
+
+
+def verify_index(claims, htbid, user_id):
+    claimed_id = claims.id_of(user_id)
+    if claimed_id is not None and htbid != claimed_id:
+        return False
+    if htbid in claims:
+        return False
+    claims.claim(htbid, user_id)
+    return True
+
+
+def verify_scan(claimed, claimed_inv, htbid, user_id):
+    if user_id in claimed.values() and htbid != claimed_inv[user_id]:
+        return False
+    if htbid in claimed:
+        return False
+    claimed[htbid] = user_id
+    claimed_inv[user_id] = htbid
+    return True
+
+
+def time_per_attempt(fn, attempts):
+    start = time.perf_counter()
+    for i in range(attempts):
+        fn(f'NEW{i:08d}', str(900_000_000 + i))
+    return (time.perf_counter() - start) / attempts * 1e6
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES
+
+    print(f"{'claims':>10}  {'ClaimIndex (us)':>16}  {'values() scan (us)':>19}")
+    for size in sizes:
+        claimed = {f'HTB{i:08d}': str(100_000_000 + i) for i in range(size)}
+        claimed_inv = {value: key for key, value in claimed.items()}
+        claims = ClaimIndex(claimed)
+
+        index_us = time_per_attempt(lambda htbid, user: verify_index(claims, htbid, user), ATTEMPTS)
+        # the scan is slow enough at large sizes that fewer attempts will do
+        scan_attempts = max(20, ATTEMPTS * 1_000 // size)
+        scan_us = time_per_attempt(lambda htbid, user: verify_scan(claimed, claimed_inv, htbid, user), scan_attempts)
+
+        print(f'{size:>10}  {index_us:>16.2f}  {scan_us:>19.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,240 @@
+# Copyright (c) 2025, Arka Mondal. All rights reserved.
+# Use of this source code is governed by a BSD-style license that
+# can be found in the LICENSE file.
+
+"""A local stand-in for the parts of Discord the bot talks to.
+
+Guilds, members, roles, channels, messages and command contexts carry the
+attributes bot.py reads. Every call that would reach Discord goes through
+``FakeHTTP``, which adds a round trip of latency and enforces per-route and
+global rate limits. A request over a limit is counted as a 429 and waits
+out its retry-after before going through, as discord.py does. Interaction
+responses have a bucket per interaction and skip the global limit.
+"""
+
+import asyncio
+import datetime
+import itertools
+from types import SimpleNamespace
+
+import discord
+
+from verifyqueue import TokenBucket
+
+_ids = itertools.count(1_300_000_000_000_000_000)
+
+
+def next_id():
+    return next(_ids)
+
+
+class FakeHTTP:
+    def __init__(self, latency=0.04, route_rate=(5, 5), global_rate=(50, 50)):
+        self.latency = latency
+        self.route_rate = route_rate
+        self.requests = 0
+        self.ratelimited = 0
+        self.retry_after = 0.0
+        self._global = TokenBucket(*global_rate)
+        self._routes = {}
+
+    async def request(self, route, global_limit=True):
+        bucket = self._routes.get(route)
+        if bucket is None:
+            bucket = self._routes[route] = TokenBucket(*self.route_rate)
+
+        while True:
+            self.requests += 1
+            await asyncio.sleep(self.latency)
+            wait = max(bucket.take(), self._global.take() if global_limit else 0)
+            if not wait:
+                return
+            self.ratelimited += 1
+            self.retry_after += wait
+            await asyncio.sleep(wait)
+
+
+class FakeRole:
+    def __init__(self, guild, name, position=1):
+        self.id = next_id()
+        self.guild = guild
+        self.name = name
+        self.position = position
+        self.members = []
+
+    @property
+    def mention(self):
+        return f'<@&{self.id}>'
+
+    def __lt__(self, other):
+        return self.position < other.position
+
+    def __ge__(self, other):
+        return self.position >= other.position
+
+
+class FakeMember:
+    def __init__(self, guild, name):
+        self.id = next_id()
+        self.guild = guild
+        self.name = name
+        self.display_name = name
+        self.bot = False
+        self.avatar = None
+        self.roles = [guild.default_role]
+        self.created_at = discord.utils.utcnow() - datetime.timedelta(days=30)
+        self.joined_at = discord.utils.utcnow()
+
+    def __str__(self):
+        return self.name
+
+    @property
+    def mention(self):
+        return f'<@{self.id}>'
+
+    @property
+    def top_role(self):
+        return max(self.roles)
+
+    def get_role(self, role_id):
+        return discord.utils.get(self.roles, id=role_id)
+
+    async def add_roles(self, *roles, reason=None):
+        await self.guild.http.request(('member', self.guild.id))
+        for role in roles:
+            if role not in self.roles:
+                self.roles.append(role)
+                role.members.append(self)
+
+    async def remove_roles(self, *roles, reason=None):
+        await self.guild.http.request(('member', self.guild.id))
+        for role in roles:
+            if role in self.roles:
+                self.roles.remove(role)
+                role.members.remove(self)
+
+
+class FakeChannel(discord.TextChannel):
+    """Passes the bot's ``isinstance(channel, discord.TextChannel)`` checks."""
+
+    def __init__(self, guild, name):
+        self.id = next_id()
+        self.guild = guild
+        self.name = name
+        self.sent = 0
+
+    async def send(self, content=None, *, embed=None, embeds=None, file=None, view=None):
+        await self.guild.http.request(('channel', self.id))
+        self.sent += 1
+        return FakeMessage(self, self.guild.me, content or '')
+
+
+class FakeMessage:
+    def __init__(self, channel, author, content, attachments=()):
+        self.id = next_id()
+        self.channel = channel
+        self.guild = channel.guild
+        self.author = author
+        self.content = content
+        self.attachments = [SimpleNamespace(filename=name, url=url) for name, url in attachments]
+        self.created_at = discord.utils.utcnow()
+
+    async def edit(self, content=None, **kwargs):
+        await self.guild.http.request(('channel', self.channel.id))
+        self.content = content
+
+    async def delete(self):
+        await self.guild.http.request(('channel', self.channel.id))
+
+
+class FakeGuild:
+    def __init__(self, http, name='Load Test'):
+        self.id = next_id()
+        self.name = name
+        self.http = http
+        self.chunked = True
+        self.default_role = FakeRole(self, '@everyone', 0)
+        self.roles = [self.default_role]
+        self.channels = []
+        self._members = {}
+        self.me = self.add_member('HTBBot')
+        self.me.bot = True
+        self.owner = self.add_member('owner')
+
+    @property
+    def members(self):
+        return list(self._members.values())
+
+    @property
+    def member_count(self):
+        return len(self._members)
+
+    def add_role(self, name, position=1):
+        role = FakeRole(self, name, position)
+        self.roles.append(role)
+        return role
+
+    def add_channel(self, name):
+        channel = FakeChannel(self, name)
+        self.channels.append(channel)
+        return channel
+
+    def add_member(self, name):
+        member = FakeMember(self, name)
+        self._members[member.id] = member
+        return member
+
+    def get_member(self, member_id):
+        return self._members.get(member_id)
+
+    def get_role(self, role_id):
+        return discord.utils.get(self.roles, id=role_id)
+
+    def get_channel(self, channel_id):
+        return discord.utils.get(self.channels, id=channel_id)
+
+    async def bans(self, limit=None):
+        await self.http.request(('bans', self.id))
+        return
+        yield
+
+
+class FakeContext:
+    """A prefix command context, or with ``slash`` a slash command one."""
+
+    def __init__(self, bot, channel, author, content='', slash=False):
+        self.bot = bot
+        self.guild = channel.guild
+        self.channel = channel
+        self.author = author
+        self.message = FakeMessage(channel, author, content)
+        self.interaction = SimpleNamespace(id=next_id()) if slash else None
+        self.replies = []
+
+    async def defer(self, ephemeral=False):
+        if self.interaction is not None:
+            await self.guild.http.request(('interaction', self.interaction.id), global_limit=False)
+
+    async def send(self, content=None, **kwargs):
+        self.replies.append(content)
+        if self.interaction is not None:
+            await self.guild.http.request(('interaction', self.interaction.id), global_limit=False)
+            return FakeMessage(self.channel, self.guild.me, content or '')
+        return await self.channel.send(content, **kwargs)
+
+
+def delete_payload(message, cached=None):
+    return SimpleNamespace(message_id=message.id, channel_id=message.channel.id, guild_id=message.guild.id,
+                           cached_message=cached)
+
+
+def edit_payload(message, content, cached=None):
+    data = {'content': content, 'author': {'id': str(message.author.id), 'bot': message.author.bot}}
+    return SimpleNamespace(message_id=message.id, channel_id=message.channel.id, guild_id=message.guild.id,
+                           data=data, cached_message=cached)
+
+
+def install(bot, guild):
+    """Point the bot's guild and channel lookups at ``guild``."""
+    bot.get_guild = lambda guild_id: guild if guild_id == guild.id else None
+    bot.get_channel = guild.get_channel
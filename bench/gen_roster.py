@@ -0,0 +1,62 @@
+# Copyright (c) 2025, Arka Mondal. All rights reserved.
+# Use of this source code is governed by a BSD-style license that
+# can be found in the LICENSE file.
+
+"""Writes a synthetic participants.json for load tests.
+
+Ids run HTB00000000, HTB00000001, ... and every passkey can be recomputed
+with ``passkey_of(index, seed)``, so a load test never has to read the
+roster back. ``--hashed`` stores scrypt hashes the way passkeys.py does,
+which takes a while for large rosters.
+
+    python bench/gen_roster.py <count> <participants.json> [--hashed] [--seed N]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from passkeys import hash_passkey
+
+
+def htbid_of(index):
+    return f'HTB{index:08d}'
+
+
+def passkey_of(index, seed=0):
+    return hashlib.blake2b(f'{seed}:{index}'.encode(), digest_size=6).hexdigest().upper()
+
+
+def generate(path, count, hashed=False, seed=0):
+    """Write ``count`` participants to ``path``, one entry per line."""
+    with open(path, 'w') as f:
+        f.write('{\n')
+        for i in range(count):
+            passkey = passkey_of(i, seed)
+            entry = {
+                'id': htbid_of(i),
+                'name': f'Participant {i}',
+                'password': hash_passkey(passkey) if hashed else passkey,
+            }
+            f.write(f'"participant{i}@example.com": {json.dumps(entry)}{"," if i < count - 1 else ""}\n')
+        f.write('}\n')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Write a synthetic participants.json.')
+    parser.add_argument('count', type=int)
+    parser.add_argument('path')
+    parser.add_argument('--hashed', action='store_true', help='store scrypt hashes instead of plaintext passkeys')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    generate(args.path, args.count, args.hashed, args.seed)
+    print(f'Wrote {args.count} participants to {args.path}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,252 @@
+# Copyright (c) 2025, Arka Mondal. All rights reserved.
+# Use of this source code is governed by a BSD-style license that
+# can be found in the LICENSE file.
+
+"""Offline load test of bot.py against a fake guild (see fakes.py).
+
+Generates a synthetic roster, imports the real bot and drives its command
+and event functions directly: a verification rush through htbverify
+(with some wrong passkeys and some ids claimed twice), a burst of joins,
+a stream of messages that are then edited and deleted, and a few runs of
+htbcheckconsistency. ``--slash`` verifies through slash commands, whose
+replies do not share the channel's rate limit. Prints throughput, p50/p99 latency and the
+tracemalloc peak of each phase, then what the fake Discord saw.
+
+Command checks are not run, the callbacks are called as the bot would
+call them once the checks pass.
+
+    python bench/loadtest.py [--participants N] [--users N] [--joins N] [--messages N] [--storage json|sqlite]
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from fakes import FakeContext, FakeGuild, FakeHTTP, FakeMessage, delete_payload, edit_payload, install
+from gen_roster import generate, htbid_of, passkey_of
+
+OUTCOMES = (
+    ('Verified as', 'verified'),
+    ('Incorrect password', 'bad passkey'),
+    ('already been claimed', 'claimed'),
+    ('already verified', 'claimed'),
+    ('busy', 'turned away'),
+    ('Slow down', 'turned away'),
+    ('still being processed', 'turned away'),
+)
+
+
+class Phase:
+    def __init__(self, name):
+        self.name = name
+        self.latencies = []
+        self.errors = 0
+        self.wall = 0.0
+        self.peak = 0
+
+    def percentile(self, q):
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+async def run_phase(name, fn, items, spread=0.0, memory=True):
+    """Await ``fn(item)`` for every item at once, or spread over ``spread`` seconds."""
+    phase = Phase(name)
+
+    async def one(i, item):
+        if spread:
+            await asyncio.sleep(spread * i / len(items))
+        started = time.perf_counter()
+        try:
+            await fn(item)
+        except Exception as e:
+            if not phase.errors:
+                print(f'{name}: {type(e).__name__}: {e}')
+            phase.errors += 1
+        phase.latencies.append(time.perf_counter() - started)
+
+    if memory:
+        tracemalloc.reset_peak()
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i, item) for i, item in enumerate(items)))
+    phase.wall = time.perf_counter() - started
+    if memory:
+        phase.peak = tracemalloc.get_traced_memory()[1]
+    return phase
+
+
+def classify(reply):
+    for text, outcome in OUTCOMES:
+        if reply and text in reply:
+            return outcome
+    return 'other'
+
+
+async def run(htb, guild, channels, args):
+    install(htb.bot, guild)
+    if args.guild_rate:
+        htb.verify_queue.guild_rate = (args.guild_rate, args.guild_rate * 2)
+    if args.grant_interval is not None:
+        htb.role_grants.interval = args.grant_interval
+    # the part of login() that does not talk to Discord
+    await htb.bot._async_setup_hook()
+    await htb.bot.setup_hook()
+
+    rng = random.Random(args.seed)
+    organizer = guild.add_member('organizer')
+    phases = []
+
+    # verification rush, user i verifies as participant i
+    attempts = []
+    for i in range(args.users):
+        member = guild.add_member(f'user{i}')
+        htbid = htbid_of(i % args.participants)
+        passkey = passkey_of(i % args.participants, args.seed)
+        roll = rng.random()
+        if roll < args.bad_ratio:
+            passkey = 'WRONG' + passkey
+        elif roll < args.bad_ratio + args.dupe_ratio and i:
+            htbid = htbid_of((i - 1) % args.participants)
+            passkey = passkey_of((i - 1) % args.participants, args.seed)
+        attempts.append((FakeContext(htb.bot, channels['verify'], member, slash=args.slash), htbid, passkey))
+
+    async def verify(attempt):
+        ctx, htbid, passkey = attempt
+        await htb.htbverify.callback(ctx, htbid, passkey)
+
+    phases.append(await run_phase('htbverify', verify, attempts, args.spread, args.memory))
+    outcomes = {}
+    for ctx, _, _ in attempts:
+        outcome = classify(ctx.replies[-1] if ctx.replies else None)
+        outcomes[outcome] = outcomes.get(outcome, 0) + 1
+
+    # join burst
+    joiners = [guild.add_member(f'joiner{i}') for i in range(args.joins)]
+    phases.append(await run_phase('on_member_join', htb.on_member_join, joiners, args.spread, args.memory))
+
+    # message traffic, then edits and deletes of every message
+    authors = [member for member in guild.members if not member.bot]
+    messages = [FakeMessage(channels['general'], rng.choice(authors), f'message {i} ' + 'x' * rng.randrange(200))
+                for i in range(args.messages)]
+    phases.append(await run_phase('on_message', htb.cache_message, messages, 0, args.memory))
+
+    async def edit(message):
+        await htb.on_raw_message_edit(edit_payload(message, message.content + ' (edited)'))
+
+    async def delete(message):
+        await htb.on_raw_message_delete(delete_payload(message))
+
+    phases.append(await run_phase('on_raw_message_edit', edit, messages[::2], args.spread, args.memory))
+    phases.append(await run_phase('on_raw_message_delete', delete, messages, args.spread, args.memory))
+
+    async def check(ctx):
+        await htb.htbcheckconsistency.callback(ctx)
+
+    checks = [FakeContext(htb.bot, channels['admin'], organizer) for _ in range(5)]
+    phases.append(await run_phase('htbcheckconsistency', check, checks, 0, args.memory))
+
+    # give the log queue a chance to drain before what is left is spilled
+    state = await htb.guild_states.get(guild)
+    deadline = time.monotonic() + args.drain
+    while state.log_dispatcher.pending and time.monotonic() < deadline:
+        await asyncio.sleep(0.1)
+
+    claims = len(state.claims)
+    loop_lag = htb.loop_lag.max
+    await htb.bot.close()
+    return phases, outcomes, claims, loop_lag, state.log_dispatcher
+
+
+def report(phases, outcomes, claims, loop_lag, dispatcher, http, memory):
+    header = f"{'phase':<22} {'ops':>7} {'errors':>7} {'wall s':>8} {'ops/s':>9} {'p50 ms':>9} {'p99 ms':>9}"
+    print(header + (f" {'peak MB':>8}" if memory else ''))
+    for phase in phases:
+        ops = len(phase.latencies)
+        line = (f'{phase.name:<22} {ops:>7} {phase.errors:>7} {phase.wall:>8.2f} {ops / phase.wall if phase.wall else 0:>9.1f} '
+                f'{phase.percentile(0.5) * 1000:>9.1f} {phase.percentile(0.99) * 1000:>9.1f}')
+        if memory:
+            line += f' {phase.peak / (1 << 20):>8.1f}'
+        print(line)
+
+    print()
+    print('Verifications: ' + ', '.join(f'{count} {outcome}' for outcome, count in sorted(outcomes.items()))
+          + f'; {claims} claims stored')
+    print(f'Fake Discord: {http.requests} requests, {http.ratelimited} rate limited '
+          f'({http.retry_after:.1f} s retry-after)')
+    print(f'Log channel: {dispatcher.sent_embeds} embeds in {dispatcher.sent_messages} messages, '
+          f'{dispatcher.spilled} spilled to disk')
+    print(f'Event loop lag: max {loop_lag * 1000:.1f} ms')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test bot.py against a fake guild.')
+    parser.add_argument('--participants', type=int, default=10_000, help='roster size')
+    parser.add_argument('--users', type=int, default=500, help='members verifying at once')
+    parser.add_argument('--joins', type=int, default=500)
+    parser.add_argument('--messages', type=int, default=10_000)
+    parser.add_argument('--bad-ratio', type=float, default=0.05, help='share of verifications with a wrong passkey')
+    parser.add_argument('--dupe-ratio', type=float, default=0.02, help='share reusing the previous user\'s id')
+    parser.add_argument('--spread', type=float, default=0.0, help='seconds to spread each phase over, 0 for all at once')
+    parser.add_argument('--latency', type=float, default=40, help='fake Discord round trip in ms')
+    parser.add_argument('--route-rate', type=float, default=5, help='requests per second per route')
+    parser.add_argument('--global-rate', type=float, default=50, help='requests per second in total')
+    parser.add_argument('--guild-rate', type=float, default=0,
+                        help='verifications started per second per guild, 0 keeps the bot\'s own limit')
+    parser.add_argument('--grant-interval', type=float, default=None,
+                        help='seconds between role grants per guild, default keeps the bot\'s own pacing')
+    parser.add_argument('--drain', type=float, default=5, help='seconds to wait for the log queue at the end')
+    parser.add_argument('--slash', action='store_true', help='verify with the slash command instead of the prefix one')
+    parser.add_argument('--storage', choices=('json', 'sqlite'), default='json')
+    parser.add_argument('--hashed', action='store_true', help='use scrypt hashed passkeys')
+    parser.add_argument('--no-memory', dest='memory', action='store_false', help='skip tracemalloc, it slows things down')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    http = FakeHTTP(args.latency / 1000, (args.route_rate, args.route_rate), (args.global_rate, args.global_rate))
+    guild = FakeGuild(http)
+    guild.add_role("'25 Participant", 2)
+    organizers = guild.add_role('Organizer', 5)
+    channels = {name: guild.add_channel(name) for name in ('verify', 'admin', 'log', 'welcome', 'general')}
+
+    with tempfile.TemporaryDirectory(prefix='htbbot-bench-') as workdir:
+        participants = os.path.join(workdir, 'participants.json')
+        generate(participants, args.participants, args.hashed, args.seed)
+
+        # bot.py reads its settings on import
+        os.environ.update({
+            'STORAGE_BACKEND': args.storage,
+            'DATABASE_PATH': os.path.join(workdir, 'htbbot.db'),
+            'BACKUP_DIR': os.path.join(workdir, 'backup'),
+            'ROLE_ID': str(organizers.id),
+            'LOG_CHANNEL_ID': str(channels['log'].id),
+            'WELCOME_CHANNEL_ID': str(channels['welcome'].id),
+            'GUILDS_CONFIG': '',
+            'METRICS_PORT': '0',
+            'ROSTER_POLL_INTERVAL': '0',
+        })
+        sys.argv = ['bot.py', participants, os.path.join(workdir, 'claimed.json')]
+        # backups, job files and log spills land in the work directory
+        cwd = os.getcwd()
+        os.chdir(workdir)
+        try:
+            if args.memory:
+                tracemalloc.start()
+            import bot as htb
+
+            results = asyncio.run(run(htb, guild, channels, args))
+        finally:
+            os.chdir(cwd)
+        report(*results, http, args.memory)
+
+
+if __name__ == '__main__':
+    main()
@@ -2,15 +2,33 @@
 # Use of this source code is governed by a BSD-style license that
 # can be found in the LICENSE file.
 
+import asyncio
 import discord
-import json
 import os
 import sys
 import datetime
-import shutil
+import time
+from discord import app_commands
 from discord.ext import commands
 from typing import Optional
-from config import ROLE_ID, TOKEN, LOG_CHANNEL_ID, WELCOME_CHANNEL_ID
+from auditcache import AuditLogCache
+from bulk import BulkJob
+from checks import GuardFailure, in_channel, is_organizer
+from config import TOKEN, ROLE_ID, LOG_CHANNEL_ID, WELCOME_CHANNEL_ID, STORAGE_BACKEND, DATABASE_PATH, BACKUP_DIR, \
+    BACKUP_INTERVAL, GUILDS_CONFIG, SHARD_COUNT, ROSTER_POLL_INTERVAL, MESSAGE_CACHE_MB, MESSAGE_CACHE_TTL, \
+    MESSAGE_CACHE_SPILL, METRICS_HOST, METRICS_PORT
+from export import ExportPager, parse_filters, render_page, write_export
+from fileio import FileIO, LoopLagMonitor
+from guildstate import GuildConfig, GuildState, GuildStates, load_guild_configs
+from massban import ConfirmView, ban_all, describe_selection, describe_target, parse_selection, select_targets
+from messagecache import CachedMessage, MessageCache
+from metrics import Metrics, MetricsServer, http_trace
+from passkeys import AttemptLimiter, PasskeyVerifier
+from purge import MAX_PURGE, PurgeTracker, describe_filters, parse_purge_filters, purge
+from reports import send_report
+from roletracker import CLAIMED_WITHOUT_ROLE, ROLE_WITHOUT_CLAIM
+from verifymodal import ModalContext, VerifyModal
+from verifyqueue import QueueBusy, RoleGrants, VerifyQueue
 
 intents = discord.Intents.default()
 intents.message_content = True
@@ -19,7 +37,90 @@ intents.guilds = True
 intents.bans = True
 intents.members = True
 
-bot = commands.Bot(command_prefix='!', intents=intents)
+# latency histograms, Discord API counters and queue depths; see htbstats
+# and the /metrics endpoint
+metrics = Metrics()
+metrics.describe('htbbot_command_seconds', 'histogram', 'Command latency', ('command', 'status'))
+metrics.describe('htbbot_event_seconds', 'histogram', 'Event listener latency', ('event',))
+metrics.describe('htbbot_claim_write_seconds', 'histogram', 'Claim store write latency', ('op',))
+metrics_server = MetricsServer(metrics, METRICS_HOST, METRICS_PORT)
+
+class HTBContext(commands.Context):
+    """Answers slash command invocations privately.
+
+    Replies to an interaction go through its webhook, so they neither show
+    up in the channel nor count against the channel's send rate limit.
+    """
+
+    async def send(self, content=None, **kwargs):
+        if self.interaction is not None:
+            kwargs.setdefault('ephemeral', True)
+        return await super().send(content, **kwargs)
+
+class HTBBot(commands.AutoShardedBot):
+    async def setup_hook(self):
+        file_io.start()
+        loop_lag.start()
+        verify_queue.start()
+        if METRICS_PORT:
+            try:
+                await metrics_server.start()
+            except OSError as e:
+                print(f'Error: could not serve metrics on {METRICS_HOST}:{METRICS_PORT}: {e}')
+
+    async def get_context(self, origin, /, *, cls=HTBContext):
+        # prefix and slash invocations both start here, so this is where
+        # their latency is measured from
+        ctx = await super().get_context(origin, cls=cls)
+        ctx.started_at = time.perf_counter()
+        return ctx
+
+    def observe_command(self, ctx, status):
+        if ctx.command is not None:
+            metrics.observe('htbbot_command_seconds', (ctx.command.qualified_name, status),
+                            time.perf_counter() - ctx.started_at)
+
+    async def on_command_completion(self, ctx):
+        self.observe_command(ctx, 'ok')
+
+    async def _run_event(self, coro, event_name, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            await super()._run_event(coro, event_name, *args, **kwargs)
+        finally:
+            metrics.observe('htbbot_event_seconds', (event_name,), time.perf_counter() - started)
+
+    async def on_command_error(self, ctx, error):
+        self.observe_command(ctx, 'error')
+        # failed guards answer with their own message
+        if isinstance(error, GuardFailure):
+            if str(error):
+                await ctx.send(str(error))
+            return
+        await super().on_command_error(ctx, error)
+
+    async def close(self):
+        await super().close()
+        await metrics_server.stop()
+        loop_lag.stop()
+        await verify_queue.stop()
+        await guild_states.close()
+        await file_io.close()
+        message_cache.close()
+        for state in guild_states.loaded():
+            state.close_stores()
+        passkey_verifier.close()
+
+# SHARD_COUNT=0 lets discord.py ask the gateway for the recommended count
+bot = HTBBot(command_prefix='!', intents=intents, shard_count=SHARD_COUNT or None, http_trace=http_trace(metrics))
+
+# every command also runs as a slash command; slash invocations are
+# deferred before the command runs, so lookups and role grants have longer
+# than Discord's three seconds and the reply follows through the webhook
+@bot.before_invoke
+async def defer_interaction(ctx):
+    if ctx.command.extras.get('defer', True):
+        await ctx.defer(ephemeral=True)
 
 participants_data = 'participants.json'
 if len(sys.argv) > 1:
@@ -29,69 +130,142 @@ claimed_data = 'claimed.json'
 if len(sys.argv) > 2:
     claimed_data = sys.argv[2]
 
-# Load data
-with open(participants_data, 'r') as f:
-    participants = json.load(f)
-
-id_map = {value['id']: {'email': key, 'name': value['name'], 'password': value['password']} for key, value in participants.items()}
-
-claimed = {}
-claimed_inv = {}
-if os.path.exists(claimed_data) and os.path.getsize(claimed_data) > 0:
-    with open(claimed_data) as f:
-        claimed = json.load(f)
-
-    for key, value in claimed.items():
-        claimed_inv[value] = key
-
-@bot.command()
+# every file read and write goes through file_io so the event loop never
+# blocks on the disk; loop_lag keeps track of how long it blocked anyway
+file_io = FileIO()
+loop_lag = LoopLagMonitor()
+
+# claims, roster, log queue, backups, ban list and join gate are kept per
+# event guild (see guildstate.py) and loaded the first time a guild is seen.
+# Without GUILDS_CONFIG every guild shares the state described by the
+# environment, as a single-event bot always has.
+default_config = GuildConfig(
+    storage=STORAGE_BACKEND,
+    participants=participants_data,
+    claimed=claimed_data,
+    database=DATABASE_PATH,
+    backup_dir=BACKUP_DIR,
+    alert_role_id=int(ROLE_ID),
+    log_channel_id=LOG_CHANNEL_ID,
+    welcome_channel_id=WELCOME_CHANNEL_ID,
+)
+guild_configs = load_guild_configs(GUILDS_CONFIG, default_config) if GUILDS_CONFIG else None
+guild_states = GuildStates(
+    lambda key, config: GuildState(key, config, bot, file_io, welcome_batch, BACKUP_INTERVAL, ROSTER_POLL_INTERVAL),
+    default_config, guild_configs)
+# the command checks in checks.py find the guild state through the bot
+bot.guild_states = guild_states
+
+# channel listeners share one cache of recent audit log entries
+audit_cache = AuditLogCache()
+
+# content of recent messages for the delete and edit logs, kept past
+# discord.py's own message cache
+message_cache = MessageCache(file_io, MESSAGE_CACHE_MB << 20, MESSAGE_CACHE_TTL, spill_path=MESSAGE_CACHE_SPILL)
+
+passkey_verifier = PasskeyVerifier()
+verify_limiter = AttemptLimiter()
+
+# verifications wait their turn here; each user gets one in flight and
+# role grants are paced per guild
+verify_queue = VerifyQueue()
+role_grants = RoleGrants()
+
+# messages htbpurge deletes are summarised once instead of logged one by one
+purge_tracker = PurgeTracker()
+
+metrics.gauge('htbbot_loop_lag_seconds', lambda: loop_lag.last)
+metrics.gauge('htbbot_loop_lag_max_seconds', lambda: loop_lag.max)
+metrics.gauge('htbbot_loop_blocked_seconds_total', lambda: loop_lag.total_blocked)
+metrics.gauge('htbbot_verify_queue_pending', lambda: verify_queue.pending)
+metrics.gauge('htbbot_file_writes_pending', lambda: file_io.pending_writes)
+metrics.gauge('htbbot_message_cache_bytes', lambda: message_cache.size)
+metrics.gauge('htbbot_message_cache_hit_ratio', message_cache.hit_rate)
+metrics.describe('htbbot_log_queue_pending', 'gauge', 'Audit log embeds waiting to be sent', ('guild',))
+metrics.gauge('htbbot_log_queue_pending', lambda: {(s.key,): s.log_dispatcher.pending for s in guild_states.loaded()})
+metrics.describe('htbbot_claims', 'gauge', 'Claimed participant ids', ('guild',))
+metrics.gauge('htbbot_claims', lambda: {(s.key,): len(s.claims) for s in guild_states.loaded()})
+
+@bot.hybrid_command(description='Verify yourself with your participant ID and passkey', extras={'defer': False})
+@app_commands.describe(id='Your participant ID', passkey='Leave both empty to enter them privately')
+@in_channel('verify_channel')
 async def htbverify(ctx, id: str = '', passkey: str = ''):
+    if ctx.interaction is not None and (id == '' or passkey == ''):
+        # a modal is the first response, so it cannot be deferred
+        await ctx.interaction.response.send_modal(VerifyModal(verify_from_modal))
+        return
+
     if id == '' or passkey == '':
         await ctx.send("Usage: `!htbverify <id> <password>`")
         return
 
-    # Check if command is used in 'verify' channel
-    if ctx.channel.name != 'verify':
-        await ctx.send("This command can only be used in the #verify channel.")
+    await ctx.defer(ephemeral=True)
+    await start_verification(ctx, id, passkey)
+
+async def verify_from_modal(interaction, id, passkey):
+    await interaction.response.defer(ephemeral=True, thinking=True)
+    with metrics.timer('htbbot_command_seconds', ('htbverify', 'modal')):
+        await start_verification(ModalContext(interaction), id, passkey)
+
+async def start_verification(ctx, id, passkey):
+    state = await guild_states.get(ctx.guild)
+
+    retry_after = verify_limiter.retry_after(str(ctx.author.id))
+    if retry_after:
+        await ctx.send(f'Too many failed attempts. Try again in {int(retry_after) + 1} seconds.')
         return
 
+    try:
+        await verify_queue.submit(ctx.guild.id, str(ctx.author.id), lambda: verify_member(ctx, state, id, passkey))
+    except QueueBusy as e:
+        await ctx.send(str(e))
+
+async def verify_member(ctx, state, id, passkey):
     # Validate
-    participant = id_map.get(id)
+    participant = await state.roster.get(id)
     if not participant:
         await ctx.send(f'Invalid ID: {id}. Please check your ID and try again.')
         return
 
     # check if the user is trying to verify using another id
-    if str(ctx.author.id) in claimed.values() and id != claimed_inv[str(ctx.author.id)]:
-        await ctx.send(f'**WARNING!** You have been already verified with another id.<@&{int(ROLE_ID)}>')
+    claimed_id = state.claims.id_of(str(ctx.author.id))
+    if claimed_id is not None and id != claimed_id:
+        await ctx.send(f'**WARNING!** You have been already verified with another id.<@&{state.config.alert_role_id}>')
         return
 
-    if id in claimed:
-        if str(ctx.author.id) == claimed[id]:
+    if id in state.claims:
+        if str(ctx.author.id) == state.claims.user_of(id):
             await ctx.send('You have been already verified.')
         else:
             await ctx.send(f'This ID ({id}) has already been claimed.')
         return
 
-    if passkey != id_map[id]['password']:
+    if not await passkey_verifier.verify(id, passkey, participant['password']):
+        verify_limiter.failed(str(ctx.author.id))
         await ctx.send(f'Incorrect password for id: {id}')
         return
+    verify_limiter.succeeded(str(ctx.author.id))
+
+    # another user may have claimed it while the passkey was checked
+    if id in state.claims or id in state.verifying:
+        await ctx.send(f'This ID ({id}) has already been claimed.')
+        return
 
     # Find the role
-    role = discord.utils.get(ctx.guild.roles, name="'25 Participant")
+    role = state.participant_role(ctx.guild)
     if not role:
         await ctx.send('Role not found. Contact Organizers.')
         return
 
+    state.verifying.add(id)
     try:
         # Add role and update records
-        await ctx.author.add_roles(role)
-        claimed[id] = str(ctx.author.id)
-        claimed_inv[str(ctx.author.id)] = id
-
-        # Save claimed IDs
-        with open(claimed_data, 'w') as f:
-            json.dump(claimed, f, indent=4)
+        await role_grants.grant(ctx.author, role)
+        state.role_tracker.set_holder(str(ctx.author.id), True)
+        state.claims.claim(id, str(ctx.author.id))
+        with metrics.timer('htbbot_claim_write_seconds', ('claim',)):
+            await state.claim_store.record_claim(id, str(ctx.author.id))
+        state.claim_store.maybe_compact(state.claims)
 
         await ctx.send(f'Verified as **{participant["name"]}**! You\'ve received the "{role.name}" role.')
     except discord.Forbidden:
@@ -99,90 +273,241 @@ async def htbverify(ctx, id: str = '', passkey: str = ''):
     except Exception as e:
         print(f'Error: {e}')
         await ctx.send("Error processing verification. Contact Organizers.")
+    finally:
+        state.verifying.discard(id)
 
-@bot.command()
-async def htbclearverifystatus(ctx, *ids):
-    has_role = discord.utils.get(ctx.author.roles, name='Organizer')
-    if not has_role:
-        await ctx.send("Bruh! you don't have permission to use this command.")
-        return
+@bot.hybrid_command(description='Clear the verification status of all or some participants')
+@is_organizer("Bruh! you don't have permission to use this command.")
+@in_channel('admin_channel')
+async def htbclearverifystatus(ctx, *, ids: str = ''):
+    ids = ids.split()
+    state = await guild_states.get(ctx.guild)
 
-    if ctx.channel.name != 'admin-bot-cmd-run':
-        await ctx.send("This command can only be used in the #admin-bot-cmd-run channel.")
+    role = state.participant_role(ctx.guild)
+    if not role:
+        await ctx.send(f"Error: Role {state.config.participant_role} not found.")
         return
 
-    role = discord.utils.get(ctx.guild.roles, name="'25 Participant")
+    if len(ids) == 1 and ids[0] == 'resume':
+        job = await BulkJob.resume(file_io, state.job_name('clearverifystatus'))
+        if job is None:
+            await ctx.send("There is no interrupted clear to resume.")
+            return
+    else:
+        if await file_io.run(os.path.exists, os.path.join('jobs', f"{state.job_name('clearverifystatus')}.json")):
+            await ctx.send("An interrupted clear is pending. Run `!htbclearverifystatus resume` first.")
+            return
+
+        # delete purged member list from verification status
+        if len(ids) == 1 and ids[0] == 'allandiamsure':
+            targets = [[htbid, member_id] for htbid, member_id in state.claims.items()]
+        else:
+            targets = [[id, state.claims.user_of(id)] for id in ids if id in state.claims]
+        job = BulkJob(file_io, state.job_name('clearverifystatus'), targets)
+
+    status = await ctx.send(f"Removing \"{role.name}\" from {job.total} members...")
+
+    async def remove_role(target):
+        htbid, member_id = target
+        member = ctx.guild.get_member(int(member_id))
+        if member and role in member.roles:
+            # the claim stays until the job is done, keep the member update
+            # that follows from being reported as drift
+            state.clearing.add(member_id)
+            await member.remove_roles(role)
+            state.role_tracker.set_holder(member_id, False)
+            return True
+        return False
+
+    async def show_progress(job):
+        await status.edit(content=f"Removing \"{role.name}\": {job.processed}/{job.total} processed, \
+{job.changed} removed, {len(job.failed)} failed")
+
+    try:
+        await job.run(remove_role, show_progress)
+
+        # persist every claim deletion in a single batch; failed members keep
+        # their claim so the clear can be repeated for them
+        htbids = []
+        for htbid, member_id in job.done:
+            if state.claims.user_of(htbid) == member_id:
+                state.claims.unclaim(htbid)
+                htbids.append(htbid)
+
+        with metrics.timer('htbbot_claim_write_seconds', ('unclaim',)):
+            await state.claim_store.record_unclaim(htbids)
+        state.claim_store.maybe_compact(state.claims)
+    finally:
+        state.clearing.difference_update(member_id for _, member_id in job.done)
+        state.clearing.difference_update(member_id for (_, member_id), _ in job.failed)
+    await job.finish()
+
+    message = f"Removed \"{role.name}\" from {job.changed} members.\nMember list: {' '.join(member_id for _, member_id in job.done)}"
+    if job.failed:
+        message += f"\nFailed: {' '.join(htbid for (htbid, _), _ in job.failed)}"
+    await ctx.send(message)
+
+# kicks per second the deadline prune may spend, so verification and
+# moderation keep part of the bucket
+PRUNE_RATE = 2
+
+def find_unverified(guild, role, state):
+    """Members with neither the participant role nor a claim; returns (targets, protected)."""
+    organizer = state.resolver.role(guild, state.config.organizer_role)
+    targets = []
+    protected = []
+    for member in guild.members:
+        if member.bot or role in member.roles or state.claims.has_user(str(member.id)):
+            continue
+        if member == guild.owner or (organizer and organizer in member.roles) or member.top_role >= guild.me.top_role:
+            protected.append(member)
+        else:
+            targets.append(member)
+    return targets, protected
+
+@bot.hybrid_command(description='Kick every member who never verified (dry run without arguments)')
+@is_organizer("Bruh! you don't have permission to use this command.")
+@in_channel('admin_channel')
+async def htbpruneunverified(ctx, arg: str = ''):
+    state = await guild_states.get(ctx.guild)
+
+    role = state.participant_role(ctx.guild)
     if not role:
-        await ctx.send("Error: Role '25 Participant not found.")
+        await ctx.send(f"Error: Role {state.config.participant_role} not found.")
         return
 
-    rm_count = 0
-    rm_list = {}
-
-    # delete purged member list from verification status
-    if len(ids) == 1 and ids == 'allandiamsure':
-        for htbid, member_id in claimed.items():
-            member = ctx.guild.get_member(int(member_id))
-            if member and role in member.roles:
-                await member.remove_roles(role)
-                rm_count += 1
-            rm_list[htbid] = member_id
+    if arg == 'resume':
+        job = await BulkJob.resume(file_io, state.job_name('pruneunverified'), rate=PRUNE_RATE)
+        if job is None:
+            await ctx.send("There is no interrupted prune to resume.")
+            return
     else:
-        for id in ids:
-            if id not in claimed.keys():
-                continue
+        if await file_io.run(os.path.exists, os.path.join('jobs', f"{state.job_name('pruneunverified')}.json")):
+            await ctx.send("An interrupted prune is pending. Run `!htbpruneunverified resume` first.")
+            return
 
-            member = ctx.guild.get_member(int(claimed[id]))
-            if member and role in member.roles:
-                await member.remove_roles(role)
-                rm_count += 1
-            rm_list[id] = claimed[id]
+        targets, protected = find_unverified(ctx.guild, role, state)
+        if arg != 'allandiamsure':
+            details = '\n'.join(['Would be kicked:', *(f'{member.id} {member}' for member in targets),
+                                 'Protected (owner, organizers, roles above the bot):',
+                                 *(f'{member.id} {member}' for member in protected)])
+            await send_report(ctx, f"Dry run: {len(targets)} members have neither \"{role.name}\" nor a claim, \
+{len(protected)} of them are protected.\nRun `!htbpruneunverified allandiamsure` to kick them.", details, 'prune.txt')
+            return
+        job = BulkJob(file_io, state.job_name('pruneunverified'), [str(member.id) for member in targets], rate=PRUNE_RATE)
 
-    for htbid in rm_list.keys():
-        del claimed[htbid]
+    status = await ctx.send(f"Kicking {job.total} unverified members...")
+    # kept in the checkpoint so a resumed prune reports every kick
+    kicked = job.meta.setdefault('kicked', [])
 
-    for member_id in rm_list.values():
-        del claimed_inv[member_id]
+    async def kick(member_id):
+        member = ctx.guild.get_member(int(member_id))
+        # gone already, or verified since the list was made
+        if member is None or role in member.roles or state.claims.has_user(member_id):
+            return False
+        await member.kick(reason="Did not verify before the deadline")
+        kicked.append(member_id)
+        return True
 
-    with open(claimed_data, 'w') as f:
-        json.dump(claimed, f, indent=4)
+    async def show_progress(job):
+        await status.edit(content=f"Kicking unverified members: {job.processed}/{job.total} processed, \
+{job.changed} kicked, {len(job.failed)} failed")
 
-    await ctx.send(f"Removed \"'25 Participant\" from {rm_count} members.\nMember list: {' '.join(rm_list.values())}")
+    await job.run(kick, show_progress)
+    await job.finish()
 
-@bot.command()
+    details = '\n'.join(['Kicked:', *kicked, 'Failed:', *(f'{member_id}: {error}' for member_id, error in job.failed)])
+    await send_report(ctx, f"Prune done: {job.changed} kicked, {len(job.done) - job.changed} skipped (left or verified), \
+{len(job.failed)} failed.", details, 'prune.txt')
+
+    embed = discord.Embed(
+        title="Unverified Members Pruned",
+        description=f"{job.changed} members who never verified have been kicked",
+        color=discord.Color.orange(),
+        timestamp=discord.utils.utcnow()
+    )
+    embed.add_field(name="Kicked By", value=f"{ctx.author.mention} ({ctx.author})", inline=False)
+    if job.failed:
+        embed.add_field(name="Failed", value=str(len(job.failed)), inline=False)
+    state.log_dispatcher.post(embed)
+
+@bot.hybrid_command(description='Back up the verification status')
+@is_organizer("Bruh! you don't have permission to use this command.")
+@in_channel('admin_channel')
 async def htbcrtstatbackup(ctx):
-    has_role = discord.utils.get(ctx.author.roles, name='Organizer')
-    if not has_role:
-        await ctx.send("Bruh! you don't have permission to use this command.")
+    state = await guild_states.get(ctx.guild)
+
+    try:
+        name, new_objects = await state.take_backup(manual=True)
+        if name is None:
+            await ctx.send("Nothing changed since the last backup.")
+        else:
+            await ctx.send(f"Backup ({name}) successfully created: {len(state.claims)} claims, {new_objects} changed buckets stored.")
+
+    except Exception as e:
+         await ctx.send(f"Backup failed: {str(e)}")
+
+@bot.hybrid_command(description='List backups, or restore the claims from one')
+@is_organizer("Bruh! you don't have permission to use this command.")
+@in_channel('admin_channel')
+async def htbrestorebackup(ctx, point: str = ''):
+    state = await guild_states.get(ctx.guild)
+
+    if point == '':
+        names = await file_io.run(state.backup_store.list)
+        if not names:
+            await ctx.send("There are no backups yet.")
+            return
+        await send_report(ctx, f"**{len(names)} backups** (restore with `!htbrestorebackup <backup>`):",
+                          '\n'.join(reversed(names)), 'backups.txt')
         return
 
-    if ctx.channel.name != 'admin-bot-cmd-run':
-        await ctx.send("This command can only be used in the #admin-bot-cmd-run channel.")
+    name = await file_io.run(state.backup_store.find, point)
+    if name is None:
+        await ctx.send(f"No backup at or before {point}.")
         return
 
-    # create a folder if it doesn't exist
     try:
-        os.makedirs("backup", exist_ok=True)
-
-        timestamp = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-        filename = os.path.join("backup", f"claimed_backup_{timestamp}.txt")
+        claimed = await state.restore_backup(name)
+        state.claims.replace(claimed)
+        with metrics.timer('htbbot_claim_write_seconds', ('replace',)):
+            await state.claim_store.replace_claims(claimed)
+        await ctx.send(f"Restored backup ({name}) with {len(claimed)} claims. Roles were not changed, \
+run `!htbcheckconsistency` to compare them.")
 
-        shutil.copyfile("claimed.json", filename)
+    except Exception as e:
+        await ctx.send(f"Restore failed: {str(e)}")
 
-        await ctx.send(f"File ({filename}) successfully backed up.")
+@bot.hybrid_command(description='Reload the participant roster after editing it')
+@is_organizer("Bruh! you don't have permission to use this command.")
+@in_channel('admin_channel')
+async def htbreloadroster(ctx):
+    state = await guild_states.get(ctx.guild)
 
-    except Exception as e:
-         await ctx.send(f"Backup failed: {str(e)}")
+    try:
+        added, changed, removed = await state.reload_roster()
+    except (OSError, ValueError, KeyError) as e:
+        await ctx.send(f"Reload failed, the old roster is still in use: {str(e)}")
+        return
 
+    if not (added or changed or removed):
+        await ctx.send("The roster is unchanged.")
+        return
 
-@bot.command()
+    # removed participants keep their claim and role until cleared
+    still_claimed = [htbid for htbid in removed if htbid in state.claims]
+    details = '\n'.join(['Added:', *added, 'Changed:', *changed, 'Removed:', *removed])
+    summary = f"Roster reloaded: {len(added)} added, {len(changed)} changed, {len(removed)} removed."
+    if still_claimed:
+        summary += f"\n{len(still_claimed)} removed IDs are still claimed, clear them with \
+`!htbclearverifystatus {' '.join(still_claimed[:5])}{' ...' if len(still_claimed) > 5 else ''}`"
+    await send_report(ctx, summary, details, 'roster.txt')
+
+@bot.hybrid_command(description='Ban a user from the server')
+@is_organizer()
 async def htbban(ctx, member: Optional[discord.Member] = None, reason: Optional[str] = None):
     """Bans a member from the server."""
-    # Check if user has Organizer role
-    has_role = discord.utils.get(ctx.author.roles, name='Organizer')
-    if not has_role:
-        await ctx.send("You don't have permission to use this command. Organizer role required.")
-        return
+    state = await guild_states.get(ctx.guild)
 
     # Check if a member was specified
     if member is None:
@@ -212,6 +537,7 @@ async def htbban(ctx, member: Optional[discord.Member] = None, reason: Optional[
 
         # Ban the member
         await ctx.guild.ban(member, reason=reason, delete_message_seconds=0)
+        state.ban_index.add(member, reason)
 
         # Confirmation message
         confirmation = f"{member} has been banned."
@@ -220,49 +546,56 @@ async def htbban(ctx, member: Optional[discord.Member] = None, reason: Optional[
         await ctx.send(confirmation)
 
         # Log the ban action
-        log_channel = bot.get_channel(LOG_CHANNEL_ID)
-        if isinstance(log_channel, discord.TextChannel):
-            embed = discord.Embed(
-                title="Member Banned",
-                description=f"{member.mention} ({member}) has been banned",
-                color=discord.Color.dark_red(),
-                timestamp=discord.utils.utcnow()
-            )
-            embed.add_field(name="Banned By", value=f"{ctx.author.mention} ({ctx.author})", inline=False)
-            if reason:
-                embed.add_field(name="Reason", value=reason, inline=False)
-            embed.set_thumbnail(url=member.display_avatar.url)
-            embed.set_footer(text=f"User ID: {member.id}")
-            await log_channel.send(embed=embed)
+        embed = discord.Embed(
+            title="Member Banned",
+            description=f"{member.mention} ({member}) has been banned",
+            color=discord.Color.dark_red(),
+            timestamp=discord.utils.utcnow()
+        )
+        embed.add_field(name="Banned By", value=f"{ctx.author.mention} ({ctx.author})", inline=False)
+        if reason:
+            embed.add_field(name="Reason", value=reason, inline=False)
+        embed.set_thumbnail(url=member.display_avatar.url)
+        embed.set_footer(text=f"User ID: {member.id}")
+        state.log_dispatcher.post(embed)
 
     except discord.Forbidden:
         await ctx.send("I don't have permission to ban members.")
     except discord.HTTPException as e:
         await ctx.send(f"An error occurred while trying to ban the member: {e}")
 
-@bot.command()
-async def htbunban(ctx, member_id: Optional[int] = None):
-    """Unbans a member from the server."""
-    has_role = discord.utils.get(ctx.author.roles, name='Organizer')
-    if not has_role:
-        await ctx.send("You don't have permission to use this command. Organizer role required.")
+@bot.hybrid_command(description='Unban one or more users by id')
+@is_organizer()
+async def htbunban(ctx, *, member_ids: str = ''):
+    """Unbans one or more members from the server."""
+    state = await guild_states.get(ctx.guild)
+
+    try:
+        member_ids = [int(member_id) for member_id in member_ids.split()]
+    except ValueError:
+        member_ids = []
+    if not member_ids:
+        await ctx.send("Usage: `!htbunban <user_id> [user_id...]`")
         return
 
-    if member_id is None:
-        await ctx.send("Usage: `!htbunban <user_id>`")
+    if len(member_ids) > 1:
+        await bulk_unban(ctx, state, member_ids)
         return
 
+    member_id = member_ids[0]
     try:
-        # Fetch the list of banned users properly
-        banned_users = [ban async for ban in ctx.guild.bans()]
-        user = next((ban_entry.user for ban_entry in banned_users if ban_entry.user.id == member_id), None)
-
-        if user is None:
+        # Look up the single ban entry instead of paging the whole ban list
+        try:
+            ban_entry = await ctx.guild.fetch_ban(discord.Object(id=member_id))
+        except discord.NotFound:
+            state.ban_index.remove(member_id)
             await ctx.send(f"User with ID {member_id} was not found in the ban list.")
             return
+        user = ban_entry.user
 
         # Unban the user
         await ctx.guild.unban(user)
+        state.ban_index.remove(user.id)
         await ctx.send(f"User {user} ({member_id}) has been unbanned.")
 
         # DM the user before unbanning if possible
@@ -274,31 +607,155 @@ async def htbunban(ctx, member_id: Optional[int] = None):
         #     pass
 
         # Log the unban action
-        log_channel = bot.get_channel(LOG_CHANNEL_ID)
-        if isinstance(log_channel, discord.TextChannel):  # Ensure it's a text channel
-            embed = discord.Embed(
-                title="Member Unbanned",
-                description=f"{user.mention} ({user}) has been unbanned",
-                color=discord.Color.green(),
-                timestamp=discord.utils.utcnow()
-            )
-            embed.add_field(name="Unbanned By", value=f"{ctx.author.mention} ({ctx.author})", inline=False)
-            embed.set_footer(text=f"User ID: {user.id}")
-            await log_channel.send(embed=embed)
+        embed = discord.Embed(
+            title="Member Unbanned",
+            description=f"{user.mention} ({user}) has been unbanned",
+            color=discord.Color.green(),
+            timestamp=discord.utils.utcnow()
+        )
+        embed.add_field(name="Unbanned By", value=f"{ctx.author.mention} ({ctx.author})", inline=False)
+        embed.set_footer(text=f"User ID: {user.id}")
+        state.log_dispatcher.post(embed)
 
     except discord.Forbidden:
         await ctx.send("I don't have permission to unban members.")
     except discord.HTTPException as e:
         await ctx.send(f"An error occurred while trying to unban the member: {e}")
 
-@bot.command()
+async def bulk_unban(ctx, state, member_ids):
+    status = await ctx.send(f"Unbanning {len(member_ids)} users...")
+    not_banned = set()
+
+    async def unban(member_id):
+        try:
+            await ctx.guild.unban(discord.Object(id=member_id), reason=f"Bulk unban by {ctx.author}")
+        except discord.NotFound:
+            not_banned.add(member_id)
+            return False
+        state.ban_index.remove(member_id)
+        return True
+
+    async def show_progress(job):
+        await status.edit(content=f"Unbanning: {job.processed}/{job.total} processed, {job.changed} unbanned, \
+{len(job.failed)} failed")
+
+    job = BulkJob(file_io, f'unban-{ctx.message.id}', member_ids)
+    await job.run(unban, show_progress)
+    await job.finish()
+
+    unbanned = [member_id for member_id in job.done if member_id not in not_banned]
+    details = '\n'.join(['Unbanned:', *map(str, unbanned),
+                         'Not in the ban list:', *map(str, sorted(not_banned)),
+                         'Failed:', *(f'{member_id}: {error}' for member_id, error in job.failed)])
+    await send_report(ctx, f"Unbanned {len(unbanned)} users, {len(not_banned)} were not banned, \
+{len(job.failed)} failed.", details, 'unban.txt')
+
+    if unbanned:
+        embed = discord.Embed(
+            title="Members Unbanned",
+            description=f"{len(unbanned)} users have been unbanned",
+            color=discord.Color.green(),
+            timestamp=discord.utils.utcnow()
+        )
+        embed.add_field(name="Unbanned By", value=f"{ctx.author.mention} ({ctx.author})", inline=False)
+        ids = ' '.join(map(str, unbanned))
+        embed.add_field(name="User IDs", value=ids[:1021] + "..." if len(ids) > 1024 else ids, inline=False)
+        state.log_dispatcher.post(embed)
+
+@bot.hybrid_command(description='Preview, then ban every matching user')
+@is_organizer()
+async def htbmassban(ctx, *, query: str = ''):
+    """Bans every member matching a selection, after a preview."""
+    if query == '':
+        await ctx.send("Usage: `!htbmassban [joined:<minutes>] [age:<days>] [name:<regex>] [user_id...] \
+[delete:<hours>] [reason:<text>]`")
+        return
+
+    try:
+        selection = parse_selection(query)
+    except ValueError as e:
+        await ctx.send(str(e))
+        return
+
+    state = await guild_states.get(ctx.guild)
+
+    targets, protected = select_targets(ctx.guild, ctx.author, selection)
+    if not targets:
+        await ctx.send(f"Nobody to ban ({describe_selection(selection)}), {len(protected)} protected members matched.")
+        return
+
+    details = '\n'.join(['Targets:', *map(describe_target, targets),
+                         'Skipped (bots, owner, you, same or higher role):', *map(describe_target, protected)])
+    await send_report(ctx, f"**Mass ban preview:** {len(targets)} users ({describe_selection(selection)}), \
+{len(protected)} protected members skipped.", details, 'massban.txt')
+
+    view = ConfirmView(ctx.author.id)
+    prompt = await ctx.send(f"Ban these {len(targets)} users?", view=view)
+    if await view.wait():
+        await prompt.edit(content="Mass ban timed out, nobody was banned.", view=None)
+        return
+    if not view.confirmed:
+        return
+
+    reason = selection['reason'] or f"Mass ban by {ctx.author}"
+
+    async def show_progress(done, total):
+        await prompt.edit(content=f"Banning: {done}/{total} processed")
+
+    banned, failed = await ban_all(ctx.guild, file_io, f'massban-{ctx.message.id}', targets, reason,
+                                   selection['delete'], show_progress)
+
+    members = {target.id: target for target in targets if isinstance(target, discord.Member)}
+    for user_id in banned:
+        if user_id in members:
+            state.ban_index.add(members[user_id], reason)
+
+    details = '\n'.join(['Banned:', *map(str, banned), 'Failed:', *(f'{user_id}: {error}' for user_id, error in failed)])
+    await send_report(ctx, f"Banned {len(banned)} users, {len(failed)} failed.", details, 'massban.txt')
+
+    # one log entry for the whole raid instead of one per ban
+    embed = discord.Embed(
+        title="Mass Ban",
+        description=f"{len(banned)} users have been banned ({describe_selection(selection)})",
+        color=discord.Color.dark_red(),
+        timestamp=discord.utils.utcnow()
+    )
+    embed.add_field(name="Banned By", value=f"{ctx.author.mention} ({ctx.author})", inline=False)
+    embed.add_field(name="Reason", value=reason, inline=False)
+    ids = ' '.join(map(str, banned))
+    embed.add_field(name="User IDs", value=(ids[:1021] + "..." if len(ids) > 1024 else ids) or 'none', inline=False)
+    if failed:
+        embed.add_field(name="Failed", value=str(len(failed)), inline=False)
+    state.log_dispatcher.post(embed)
+
+@bot.hybrid_command(description='Search the ban list')
+@is_organizer()
+async def htbbansearch(ctx, *, query: str = ''):
+    """Searches the ban list by user ID or name."""
+    state = await guild_states.get(ctx.guild)
+
+    if query == '':
+        await ctx.send("Usage: `!htbbansearch <user_id|name>`")
+        return
+
+    if not state.ban_index.ready:
+        await ctx.send("The ban list is still being loaded. Try again in a moment.")
+        return
+
+    matches = state.ban_index.search(query)
+    if not matches:
+        await ctx.send(f"No bans matching `{query}` ({len(state.ban_index)} bans in total).")
+        return
+
+    lines = [f"`{user_id}` {name}" + (f" - {reason}" if reason else '') for user_id, name, reason in matches]
+    await send_report(ctx, f"**{len(matches)} bans matching `{query}`:**", '\n'.join(lines), 'bans.txt')
+
+@bot.hybrid_command(description='Kick a user from the server')
 @commands.has_permissions(kick_members=True)
+@is_organizer()
 async def htbkick(ctx, member: Optional[discord.Member], reason: Optional[str] = None):
     """Kicks a member from the server."""
-    has_role = discord.utils.get(ctx.author.roles, name='Organizer')
-    if not has_role:
-        await ctx.send("You don't have permission to use this command. Organizer role required.")
-        return
+    state = await guild_states.get(ctx.guild)
 
     if member is None:
         await ctx.send("Usage: `!htbkick @user [reason]`")
@@ -329,27 +786,25 @@ async def htbkick(ctx, member: Optional[discord.Member], reason: Optional[str] =
             confirmation += f" for: {reason}"
         await ctx.send(confirmation)
 
-        log_channel = bot.get_channel(LOG_CHANNEL_ID)
-        if isinstance(log_channel, discord.TextChannel):  # Ensure it's a text channel
-            embed = discord.Embed(
-                title="Member Kicked",
-                description=f"{member.mention} ({member}) has been kicked",
-                color=discord.Color.orange(),
-                timestamp=discord.utils.utcnow()
-            )
-            embed.add_field(name="Kicked By", value=f"{ctx.author.mention} ({ctx.author})", inline=False)
-            if reason:
-                embed.add_field(name="Reason", value=reason, inline=False)
-            embed.set_thumbnail(url=member.display_avatar.url)
-            embed.set_footer(text=f"User ID: {member.id}")
-            await log_channel.send(embed=embed)
+        embed = discord.Embed(
+            title="Member Kicked",
+            description=f"{member.mention} ({member}) has been kicked",
+            color=discord.Color.orange(),
+            timestamp=discord.utils.utcnow()
+        )
+        embed.add_field(name="Kicked By", value=f"{ctx.author.mention} ({ctx.author})", inline=False)
+        if reason:
+            embed.add_field(name="Reason", value=reason, inline=False)
+        embed.set_thumbnail(url=member.display_avatar.url)
+        embed.set_footer(text=f"User ID: {member.id}")
+        state.log_dispatcher.post(embed)
 
     except discord.Forbidden:
         await ctx.send("I don't have permission to kick members.")
     except discord.HTTPException as e:
         await ctx.send(f"An error occurred while trying to kick the member: {e}")
 
-@bot.command()
+@bot.hybrid_command(description='Display help for the bot commands')
 async def htbhelp(ctx):
     """Displays help information for bot commands."""
     help_message = (
@@ -358,135 +813,282 @@ async def htbhelp(ctx):
         "\t**Example Usage:**\n"
         "\t`!htbverify HTB202503XXXX PASSKEY` - Verifies your ID and assigns the appropriate role.\n\n"
         "`!htbwhoareyou` - Display a fun message.\n"
-        "`!htbhelp` - Display this help message.\n\n"
+        "`!htbhelp` - Display this help message.\n"
+        "Every command is also a slash command; `/htbverify` asks for your passkey privately.\n\n"
         "====== Organizers Only ======\n"
         "`!htbban @user [reason]` - Ban a user from the server.\n"
-        "`!htbunban <user_id>` - Unban a user from the server.\n"
+        "`!htbunban <user_id> [user_id...]` - Unban one or more users from the server.\n"
+        "`!htbbansearch <user_id|name>` - Search the ban list.\n"
+        "`!htbmassban [joined:<minutes>] [age:<days>] [name:<regex>] [user_id...] [delete:<hours>] [reason:<text>]` - \
+Preview, then ban every matching user.\n"
         "`!htbkick @user [reason]` - Kick a user from the server.\n"
-        "`!htbverifystatcheck <id>|dumpall` - Check the verification status of participant\n"
-        "`!htbpurge <count>` - Purge #count messages\n"
-        "`!htbclearverifystatus allandiamsure|ids...` - Purge all verification status of all participants\n"
-        "`!htbcrtstatbackup - Backs-up the verification stat copy!`"
+        "`!htbverifystatcheck <id>|dumpall|page [filters]` - Check the verification status of participant\n"
+        "`!htbcheckconsistency [fixall|fixhasclaimed|fixhasrole]` - Compare claims with role holders, optionally repair\n"
+        "`!htbpurge <count> [@user] [contains:<text>] [attachments] [after:<date>] [before:<date>]` - Purge #count \
+matching messages\n"
+        "`!htbclearverifystatus allandiamsure|resume|ids...` - Purge all verification status of all participants\n"
+        "`!htbpruneunverified [allandiamsure|resume]` - Kick every member who never verified (dry run without arguments)\n"
+        "`!htbcrtstatbackup - Backs-up the verification stat copy!`\n"
+        "`!htbrestorebackup [backup]` - List backups, or restore the claims from one\n"
+        "`!htbreloadroster` - Reload the participant roster after editing it\n"
+        "`!htbloopstat` - Show how long the bot's event loop has been blocked\n"
+        "`!htbcachestat` - Show message and audit log cache statistics\n"
+        "`!htbstats` - Show command latencies, Discord API usage and queue depths\n"
+        "`!htbsync` - Register the slash commands in this server"
     )
     await ctx.send(help_message)
 
-@bot.command()
-async def htbverifystatcheck(ctx, id: str = ''):
+@bot.hybrid_command(description='Check the verification status of a participant')
+@is_organizer("Bruh! you don't have permission to use this command.")
+@in_channel('admin_channel')
+async def htbverifystatcheck(ctx, id: str = '', *, query: str = ''):
+    args = query.split()
     if id == '':
-        await ctx.send("Usage: `!htbverifystatcheck <id>`")
+        await ctx.send("Usage: `!htbverifystatcheck <id>|dumpall|page [csv|jsonl] [verified|unverified|all] \
+[name:<prefix>] [email:<prefix>]`")
         return
 
-    has_role = discord.utils.get(ctx.author.roles, name='Organizer')
-    if not has_role:
-        await ctx.send("Bruh! you don't have permission to use this command.")
-        return
+    state = await guild_states.get(ctx.guild)
 
-    if ctx.channel.name != 'admin-bot-cmd-run':
-        await ctx.send("This command can only be used in the #admin-bot-cmd-run channel.")
-        return
+    if id in ('dumpall', 'page'):
+        try:
+            filters = parse_filters(args)
+        except ValueError as e:
+            await ctx.send(str(e))
+            return
+
+        claimed = state.claims.snapshot()
+        if id == 'page':
+            async def render(page):
+                return await state.roster.scan(lambda entries: render_page(entries, claimed, filters, page))
 
-    if id == 'dumpall':
-        id_string = '\n'.join(f'{key}: {value}' for key, value in claimed.items())
-        await ctx.send(f"**Verification Status: success**\n{id_string}")
+            pager = ExportPager(ctx.author.id, render)
+            await ctx.send(await pager.first_page(), view=pager)
+            return
+
+        path, count = await state.roster.scan(lambda entries: write_export(entries, claimed, filters))
+        filename = f"verification-{filters['status']}.{filters['format']}" + ('.gz' if path.endswith('.gz') else '')
+        try:
+            await ctx.send(f"**Verification Status: {count} {filters['status']} participants**",
+                           file=discord.File(path, filename=filename))
+        finally:
+            await file_io.run(os.remove, path)
         return
 
-    if id not in claimed:
+    if id not in state.claims:
         await ctx.send(f"Verification Status unknown of id: {id}.")
         return
 
-    await ctx.send(f"Verifciation Status : success\n{id} -> user: `{claimed[id]}` name: {id_map[id]['name']} \
-email: {id_map[id]['email']}")
-
-@bot.command()
-async def htbcheckconsistency(ctx, arg=''):
-    has_role = discord.utils.get(ctx.author.roles, name='Organizer')
-    if not has_role:
-        await ctx.send("Bruh! you don't have permission to use this command.")
+    participant = await state.roster.get(id)
+    if participant is None:
+        # a roster reload can drop an id that is still claimed
+        await ctx.send(f"Verifciation Status : success\n{id} -> user: `{state.claims.user_of(id)}` (not in roster)")
         return
+    await ctx.send(f"Verifciation Status : success\n{id} -> user: `{state.claims.user_of(id)}` name: {participant['name']} \
+email: {participant['email']}")
 
-    if ctx.channel.name != 'admin-bot-cmd-run':
-        await ctx.send("This command can only be used in the #admin-bot-cmd-run channel.")
-        return
+@bot.hybrid_command(description='Compare claims with role holders, optionally repair')
+@is_organizer("Bruh! you don't have permission to use this command.")
+@in_channel('admin_channel')
+async def htbcheckconsistency(ctx, arg: str = ''):
+    state = await guild_states.get(ctx.guild)
 
-    role = discord.utils.get(ctx.guild.roles, name="'25 Participant")
+    role = state.participant_role(ctx.guild)
     if not role:
         await ctx.send("Unexpected Error: Role not found.")
         return
 
-    has_claimed_set = set(claimed.values())
-    members_with_role = set([str(member.id )for member in ctx.guild.members if role in member.roles])
+    if state.role_tracker.ready:
+        claimed_but_not_recv = sorted(state.role_tracker.drift[CLAIMED_WITHOUT_ROLE])
+        has_role_but_not_claimed = sorted(state.role_tracker.drift[ROLE_WITHOUT_CLAIM])
+    else:
+        has_claimed_set = state.claims.users()
+        members_with_role = set([str(member.id )for member in ctx.guild.members if role in member.roles])
 
-    claimed_but_not_recv = has_claimed_set - members_with_role
-    has_role_but_not_claimed = members_with_role - has_claimed_set
+        claimed_but_not_recv = sorted(has_claimed_set - members_with_role)
+        has_role_but_not_claimed = sorted(members_with_role - has_claimed_set)
 
     if len(claimed_but_not_recv) == 0 and len(has_role_but_not_claimed) == 0:
         await ctx.send("All records consistent")
         return
 
-    str_claimed_but_not_recv = '\n' + '\n'.join(claimed_but_not_recv) + '\n'
-    str_has_role_but_not_claimed = '\n' + '\n'.join(has_role_but_not_claimed) + '\n'
-
-    if len(claimed_but_not_recv) != 0:
-        await ctx.send(f"Inconsistent: [claimed_but_not_recv]: {str_claimed_but_not_recv}")
-        if not (arg == 'fixall' or arg == 'fixhasclaimed'):
-            return
-
-        for id in claimed_but_not_recv:
-            try:
-                await ctx.author.add_roles(role)
-                await ctx.send(f'"{role.name}" role given to `{id}`')
-            except discord.Forbidden:
-                await ctx.send("I don't have permission to assign roles. Contact Organizers.")
-            except Exception as e:
-                print(f'Error: {e}')
-
-    if len(has_role_but_not_claimed) != 0:
-        await ctx.send(f"Inconsistent: [has_role_but_not_claimed]: {str_has_role_but_not_claimed}")
-        if not (arg == 'fixall' or arg == 'fixhasrole'):
-            return
-
-        for id in has_role_but_not_claimed:
-            member = ctx.guild.get_member(int(id))
-            if member and role in member.roles:
-                await member.remove_roles(role)
-                await ctx.send(f'"{role.name}" role removed from `{id}`')
+    # plan the whole repair before touching anything
+    plan = []
+    if arg in ('fixall', 'fixhasclaimed'):
+        plan += [['grant', id] for id in claimed_but_not_recv]
+    if arg in ('fixall', 'fixhasrole'):
+        plan += [['revoke', id] for id in has_role_but_not_claimed]
 
-    return
+    details = '\n'.join(['[claimed_but_not_recv]:', *claimed_but_not_recv,
+                         '[has_role_but_not_claimed]:', *has_role_but_not_claimed])
 
-@bot.command()
-async def htbpurge(ctx, amount: int = 0):
-    has_role = discord.utils.get(ctx.author.roles, name='Organizer')
-    if not has_role:
-        await ctx.send("Bruh! you don't have permission to use this command.")
+    if not plan:
+        await send_report(ctx, f"Inconsistent: {len(claimed_but_not_recv)} claimed_but_not_recv, \
+{len(has_role_but_not_claimed)} has_role_but_not_claimed (dry run, nothing changed).\n\
+Run `!htbcheckconsistency fixall|fixhasclaimed|fixhasrole` to repair.", details, 'consistency.txt')
         return
 
+    status = await ctx.send(f"Repairing {len(plan)} members...")
+    granted = []
+    revoked = []
+    missing = []
+
+    async def repair(step):
+        op, id = step
+        member = ctx.guild.get_member(int(id))
+        if member is None:
+            missing.append(id)
+            return False
+
+        if op == 'grant' and role not in member.roles:
+            await member.add_roles(role)
+            state.role_tracker.set_holder(id, True)
+            granted.append(id)
+            return True
+        if op == 'revoke' and role in member.roles:
+            await member.remove_roles(role)
+            state.role_tracker.set_holder(id, False)
+            revoked.append(id)
+            return True
+        return False
+
+    async def show_progress(job):
+        await status.edit(content=f"Repairing: {job.processed}/{job.total} processed, {job.changed} fixed, \
+{len(job.failed)} failed")
+
+    job = BulkJob(file_io, state.job_name('checkconsistency'), plan)
+    await job.run(repair, show_progress)
+    await job.finish()
+
+    details = '\n'.join([f'"{role.name}" role given to:', *granted,
+                         f'"{role.name}" role removed from:', *revoked,
+                         'Not in server:', *missing,
+                         'Failed:', *(f'{op} {id}: {error}' for (op, id), error in job.failed)])
+
+    await send_report(ctx, f"Repair done: {len(granted)} granted, {len(revoked)} revoked, {len(missing)} not in server, \
+{len(job.failed)} failed.", details, 'consistency.txt')
+
+@bot.hybrid_command(description='Purge matching messages in this channel')
+@is_organizer("Bruh! you don't have permission to use this command.")
+async def htbpurge(ctx, amount: int = 0, *, query: str = ''):
     # Validate amount
     if amount <= 0:
         await ctx.send("Please provide a positive number of messages to delete.")
         return
 
-    # Discord API limits bulk deletion to 100 messages at a time
-    if amount > 100:
-        await ctx.send("You can only delete up to 100 messages at a time.")
+    if amount > MAX_PURGE:
+        await ctx.send(f"You can only delete up to {MAX_PURGE} messages at a time.")
+        return
+
+    try:
+        filters = parse_purge_filters(query.split())
+    except ValueError as e:
+        await ctx.send(str(e))
         return
 
+    state = await guild_states.get(ctx.guild)
+
     try:
-        # Delete the command message first
-        await ctx.message.delete()
+        # Delete the command message first; a slash command has none
+        if ctx.interaction is None:
+            purge_tracker.add((ctx.message.id,))
+            await ctx.message.delete()
+            purge_tracker.release((ctx.message.id,))
 
-        # Bulk delete messages
-        deleted = await ctx.channel.purge(limit=amount)
-        confirmation = await ctx.send(f"Deleted {len(deleted)} messages.")
+        status = await ctx.send(f"Purging up to {amount} messages ({describe_filters(filters)})...")
+
+        async def show_progress(result):
+            await status.edit(content=f"Purging: {result.deleted}/{amount} deleted, {result.scanned} scanned")
+
+        result = await purge(ctx.channel, amount, filters, purge_tracker, show_progress, skip={status.id})
+        message = f"Deleted {result.deleted} messages ({result.bulk} in bulk, {result.single} one by one)."
+        if result.failed:
+            message += f" {result.failed} could not be deleted."
+        await status.edit(content=message)
 
         # Auto-delete the confirmation message after 5 seconds
-        await confirmation.delete(delay=2)
+        await status.delete(delay=5)
 
     except discord.Forbidden:
         await ctx.send("I don't have permission to delete messages.")
+        return
     except discord.HTTPException:
         await ctx.send("An error occurred while trying to delete messages.")
+        return
+
+    if result.deleted:
+        embed = discord.Embed(
+            title="Messages Purged",
+            description=f"{result.deleted} messages purged in {ctx.channel.mention}",
+            color=discord.Color.red(),
+            timestamp=datetime.datetime.now(datetime.UTC)
+        )
+        embed.add_field(name="Purged By", value=f"{ctx.author.mention} ({ctx.author})", inline=False)
+        embed.add_field(name="Filters", value=describe_filters(filters), inline=False)
+        embed.set_footer(text=f"Scanned {result.scanned} messages | Channel ID: {ctx.channel.id}")
+        state.log_dispatcher.post(embed)
+
+@bot.hybrid_command(description="Show how long the bot's event loop has been blocked")
+@is_organizer("Bruh! you don't have permission to use this command.")
+@in_channel('admin_channel')
+async def htbloopstat(ctx):
+    await ctx.send(f"Event loop lag: last {loop_lag.last * 1000:.1f} ms, max {loop_lag.max * 1000:.1f} ms, \
+blocked {loop_lag.total_blocked:.2f} s in total over {loop_lag.samples} samples")
+
+@bot.hybrid_command(description='Show message and audit log cache statistics')
+@is_organizer("Bruh! you don't have permission to use this command.")
+@in_channel('admin_channel')
+async def htbcachestat(ctx):
+    await ctx.send(f"Message cache: {len(message_cache)} messages, {message_cache.size / (1 << 20):.1f}/\
+{message_cache.budget / (1 << 20):.0f} MB, hit rate {message_cache.hit_rate():.0%} ({message_cache.hits} memory hits, \
+{message_cache.spill_hits} spill hits, {message_cache.misses} misses)\n\
+Audit log cache: {audit_cache.hits} hits, {audit_cache.fetches} fetches")
+
+def _ms(seconds):
+    return '>30 s' if seconds == float('inf') else f'{seconds * 1000:g} ms'
+
+@bot.hybrid_command(description='Show command latencies, Discord API usage and queue depths')
+@is_organizer("Bruh! you don't have permission to use this command.")
+@in_channel('admin_channel')
+async def htbstats(ctx):
+    lines = ['Commands (count, p50, p99):']
+    for (command, status), histogram in sorted(metrics.series('htbbot_command_seconds')):
+        lines.append(f"  {command} {status}: {histogram.count}, {_ms(histogram.quantile(0.5))}, \
+{_ms(histogram.quantile(0.99))}")
+
+    lines.append('Events (count, p50, p99):')
+    events = sorted(metrics.series('htbbot_event_seconds'), key=lambda item: -item[1].count)
+    for (event,), histogram in events:
+        lines.append(f"  {event}: {histogram.count}, {_ms(histogram.quantile(0.5))}, {_ms(histogram.quantile(0.99))}")
+
+    lines.append('Claim writes (count, p50, p99):')
+    for (op,), histogram in sorted(metrics.series('htbbot_claim_write_seconds')):
+        lines.append(f"  {op}: {histogram.count}, {_ms(histogram.quantile(0.5))}, {_ms(histogram.quantile(0.99))}")
+
+    requests = sum(value for _, value in metrics.counters('htbbot_http_requests_total'))
+    limited = sum(value for _, value in metrics.counters('htbbot_http_ratelimited_total'))
+    retry_after = metrics.counter('htbbot_http_retry_after_seconds_total')
+
+    summary = f"Discord API: {requests} requests, {limited} rate limited ({retry_after:.1f} s retry-after). \
+Loop lag: last {loop_lag.last * 1000:.1f} ms, max {loop_lag.max * 1000:.1f} ms. \
+Queues: {verify_queue.pending} verifications, {file_io.pending_writes} file writes, \
+{sum(state.log_dispatcher.pending for state in guild_states.loaded())} log embeds."
+    await send_report(ctx, summary, '\n'.join(lines), 'stats.txt')
 
 @bot.command()
+@is_organizer("Bruh! you don't have permission to use this command.")
+@in_channel('admin_channel')
+async def htbsync(ctx):
+    # guild commands show up at once, global ones can take an hour
+    bot.tree.copy_global_to(guild=ctx.guild)
+    try:
+        synced = await bot.tree.sync(guild=ctx.guild)
+    except discord.HTTPException as e:
+        await ctx.send(f"Syncing slash commands failed: {e}")
+        return
+    await ctx.send(f"Synced {len(synced)} slash commands to this server.")
+
+@bot.hybrid_command(description='Display a fun message')
 async def htbwhoareyou(ctx):
     await ctx.send("Hey there! I'm the HackTheBreach Bot. Hope you're having an awesome time at the bootcamp!\n\
 Created by Arka Mondal ([ArixSnow](https://github.com/arixsnow)) and Suvan Sarkar ([OrganHarvester](https://github.com/Suvansarkar))!")
@@ -498,12 +1100,109 @@ async def on_ready():
     guild_str = 'guilds' if len(bot.guilds) > 1 else 'guild'
     print(f"Bot is in {len(bot.guilds)} {guild_str}")
 
+    # load every event guild up front and seed its participant role holders
+    # and ban list from the member cache
+    for guild in bot.guilds:
+        state = await guild_states.get(guild)
+        if state:
+            state.seed(guild)
+
+@bot.event
+async def on_guild_role_create(role):
+    state = guild_states.peek(role.guild)
+    if state:
+        state.resolver.forget_role(role)
+
+@bot.event
+async def on_guild_role_delete(role):
+    state = guild_states.peek(role.guild)
+    if state:
+        state.resolver.forget_role(role)
+
+@bot.event
+async def on_guild_role_update(before, after):
+    state = guild_states.peek(after.guild)
+    if state and before.name != after.name:
+        state.resolver.forget_role(before)
+        state.resolver.forget_role(after)
+
+@bot.event
+async def on_member_ban(guild, user):
+    state = await guild_states.get(guild)
+    if state and state.ban_index.get(user.id) is None:
+        state.ban_index.add(user)
+
+@bot.event
+async def on_member_unban(guild, user):
+    state = await guild_states.get(guild)
+    if state:
+        state.ban_index.remove(user.id)
+
+# how long role/claim drift must persist before it is reported; the bot's own
+# role grants land a moment before the claim is recorded
+DRIFT_GRACE = 15
+drift_tasks = set()
+
+async def report_drift(state, user_id):
+    await asyncio.sleep(DRIFT_GRACE)
+    kind = state.role_tracker.drift_of(user_id)
+    if kind is None or user_id in state.clearing:
+        return
+
+    if kind == CLAIMED_WITHOUT_ROLE:
+        description = f"<@{user_id}> has a verification claim but not the participant role"
+    else:
+        description = f"<@{user_id}> has the participant role without a verification claim"
+
+    embed = discord.Embed(
+        title="Verification Drift",
+        description=description,
+        color=discord.Color.orange(),
+        timestamp=datetime.datetime.now(datetime.UTC)
+    )
+    embed.add_field(name="Fix", value="`!htbcheckconsistency fixall`", inline=False)
+    embed.set_footer(text=f"User ID: {user_id}")
+    state.log_dispatcher.post(embed)
+
+def track_role_change(state, user_id, has_role):
+    if state.role_tracker.set_holder(user_id, has_role) is not None:
+        drift_task = asyncio.create_task(report_drift(state, user_id))
+        drift_tasks.add(drift_task)
+        drift_task.add_done_callback(drift_tasks.discard)
+
+@bot.event
+async def on_member_update(before, after):
+    state = await guild_states.get(after.guild)
+    if state is None:
+        return
+
+    role = state.participant_role(after.guild)
+    if not role:
+        return
+
+    has_role = role in after.roles
+    if (role in before.roles) != has_role:
+        track_role_change(state, str(after.id), has_role)
+
+@bot.event
+async def on_member_remove(member):
+    state = await guild_states.get(member.guild)
+    if state and str(member.id) in state.role_tracker.holders:
+        track_role_change(state, str(member.id), False)
+
 @bot.event
 async def on_member_join(member):
     """Event handler for when a member joins the server."""
+    state = await guild_states.get(member.guild)
+    if state is None:
+        return
+
+    # during a join storm the gate announces new members in batches
+    if state.join_gate.join(member):
+        return
 
     # Get the welcome channel
-    welcome_channel = bot.get_channel(WELCOME_CHANNEL_ID)
+    welcome_channel = bot.get_channel(state.config.welcome_channel_id)
     if not isinstance(welcome_channel, discord.TextChannel):
         return
 
@@ -535,33 +1234,82 @@ async def on_member_join(member):
     await welcome_channel.send(content=f"Hey {member.mention}, welcome to the server!", embed=embed)
 
     # Also log the join in the log channel
-    log_channel = bot.get_channel(LOG_CHANNEL_ID)
-    if isinstance(log_channel, discord.TextChannel):
-        log_embed = discord.Embed(
-            title="Member Joined",
-            description=f"{member.mention} ({member}) has joined the server",
-            color=discord.Color.green(),
+    log_embed = discord.Embed(
+        title="Member Joined",
+        description=f"{member.mention} ({member}) has joined the server",
+        color=discord.Color.green(),
+        timestamp=datetime.datetime.now(datetime.UTC)
+    )
+    log_embed.set_thumbnail(url=member.avatar.url if member.avatar else None)
+    log_embed.add_field(name="Account Created", value=member.created_at.strftime("%Y-%m-%d %H:%M:%S UTC"), inline=False)
+    log_embed.set_footer(text=f"User ID: {member.id}")
+    state.log_dispatcher.post(log_embed)
+
+async def welcome_batch(state, members):
+    """Welcomes a batch of members held back by the join storm gate."""
+    guild = members[0].guild
+    mentions = ' '.join(member.mention for member in members)
+
+    welcome_channel = bot.get_channel(state.config.welcome_channel_id)
+    if isinstance(welcome_channel, discord.TextChannel):
+        embed = discord.Embed(
+            title=f"Welcome to {guild.name}!",
+            description=f"Welcome to our server, all {len(members)} of you! We're glad to have you here.",
+            color=discord.Color.blue(),
             timestamp=datetime.datetime.now(datetime.UTC)
         )
-        log_embed.set_thumbnail(url=member.avatar.url if member.avatar else None)
-        log_embed.add_field(name="Account Created", value=member.created_at.strftime("%Y-%m-%d %H:%M:%S UTC"), inline=False)
-        log_embed.set_footer(text=f"User ID: {member.id}")
-        await log_channel.send(embed=log_embed)
+        embed.set_image(url="https://i.pinimg.com/originals/4e/9e/1f/4e9e1f5a41b738e3066d135da871a46c.gif")
+        embed.add_field(
+            name="Getting Started",
+            value="Please read the server rules <#1353659054257602610> and head over to the <#1354154665419477093> channel to verify your account.",
+            inline=False
+        )
+        embed.set_footer(text=f"We are now {guild.member_count} members")
+        await welcome_channel.send(content=f"Hey {mentions}, welcome to the server!", embed=embed)
+
+    lines = [f"{member.mention} ({member}) - created {member.created_at.strftime('%Y-%m-%d')}" for member in members]
+    description = '\n'.join(lines)
+    log_embed = discord.Embed(
+        title=f"{len(members)} Members Joined",
+        description=description[:4093] + "..." if len(description) > 4096 else description,
+        color=discord.Color.green(),
+        timestamp=datetime.datetime.now(datetime.UTC)
+    )
+    log_embed.set_footer(text=f"Join storm: {state.join_gate.rate()} joins in the last {state.join_gate.window}s")
+    state.log_dispatcher.post(log_embed)
+
+@bot.listen('on_message')
+async def cache_message(message):
+    if message.guild is not None and not message.author.bot:
+        message_cache.put(CachedMessage.from_message(message))
 
 @bot.event
-async def on_message_delete(message):
-    if message.author.bot:
+async def on_raw_message_delete(payload):
+    # purges post one summary instead
+    if payload.message_id in purge_tracker:
+        message_cache.forget((payload.message_id,))
         return
 
-    log_channel = bot.get_channel(LOG_CHANNEL_ID)
-
-    # Ensure log_channel is a TextChannel before sending messages
-    if not isinstance(log_channel, discord.TextChannel):
+    state = await guild_states.get(bot.get_guild(payload.guild_id) if payload.guild_id else None)
+    if state is None:
         return
 
+    # discord.py's cache has the full message, ours has the content of
+    # messages it has already dropped
+    message = payload.cached_message
+    if message is not None:
+        message_cache.forget((message.id,))
+        if message.author.bot:
+            return
+        message = CachedMessage.from_message(message)
+    else:
+        message = await message_cache.pop(payload.message_id)
+        if message is None:
+            return
+
     embed = discord.Embed(
         title="Message Deleted",
-        description=f"Message by {message.author.mention} deleted in {message.channel.mention}",
+        description=f"Message by <@{message.author_id}> deleted in <#{message.channel_id}>",
         color=discord.Color.red(),
         timestamp=datetime.datetime.now(datetime.UTC)
     )
@@ -572,52 +1320,70 @@ async def on_message_delete(message):
         embed.add_field(name="Content", value=content, inline=False)
 
     if message.attachments:
-        attachment_info = "\n".join(f"[{a.filename}]({a.url})" for a in message.attachments)
+        attachment_info = "\n".join(f"[{filename}]({url})" for filename, url in message.attachments)
         if len(attachment_info) > 1024:
             attachment_info = attachment_info[:1021] + "..."
         embed.add_field(name="Attachments", value=attachment_info, inline=False)
 
-    embed.set_footer(text=f"User ID: {message.author.id} | Message ID: {message.id}")
+    embed.set_footer(text=f"User ID: {message.author_id} | Message ID: {message.message_id}")
 
-    await log_channel.send(embed=embed)
+    state.log_dispatcher.post(embed)
 
 @bot.event
-async def on_message_edit(before, after):
-    if before.author.bot or before.content == after.content:
+async def on_raw_bulk_message_delete(payload):
+    message_cache.forget(payload.message_ids)
+
+@bot.event
+async def on_raw_message_edit(payload):
+    # embeds being unfurled also arrive as edits, without content
+    author = payload.data.get('author')
+    if 'content' not in payload.data or author is None or author.get('bot'):
         return
 
-    log_channel = bot.get_channel(LOG_CHANNEL_ID)
+    state = await guild_states.get(bot.get_guild(payload.guild_id) if payload.guild_id else None)
+    if state is None:
+        return
 
-    # Ensure log_channel is a TextChannel before sending messages
-    if not isinstance(log_channel, discord.TextChannel):
+    author_id = int(author['id'])
+    after = payload.data['content']
+    if payload.cached_message is not None:
+        before = payload.cached_message.content
+    else:
+        record = await message_cache.get(payload.message_id)
+        before = record.content if record else None
+    message_cache.edit(payload.message_id, payload.channel_id, author_id, after)
+
+    if before == after:
         return
 
     embed = discord.Embed(
         title="Message Edited",
-        description=f"Message by {before.author.mention} edited in {before.channel.mention}",
+        description=f"Message by <@{author_id}> edited in <#{payload.channel_id}>",
         color=discord.Color.gold(),
         timestamp=datetime.datetime.now(datetime.UTC)
     )
 
     # Add before content if it exists
-    if before.content:
-        content = before.content[:1021] + "..." if len(before.content) > 1024 else before.content
+    if before is None:
+        embed.add_field(name="Before", value="(no longer cached)", inline=False)
+    elif before:
+        content = before[:1021] + "..." if len(before) > 1024 else before
         embed.add_field(name="Before", value=content, inline=False)
 
     # Add after content if it exists
-    if after.content:
-        content = after.content[:1021] + "..." if len(after.content) > 1024 else after.content
+    if after:
+        content = after[:1021] + "..." if len(after) > 1024 else after
         embed.add_field(name="After", value=content, inline=False)
 
     embed.add_field(
         name="Jump to Message",
-        value=f"[Click here]({after.jump_url})",
+        value=f"[Click here](https://discord.com/channels/{payload.guild_id}/{payload.channel_id}/{payload.message_id})",
         inline=False
     )
 
-    embed.set_footer(text=f"User ID: {before.author.id} | Message ID: {before.id}")
+    embed.set_footer(text=f"User ID: {author_id} | Message ID: {payload.message_id}")
 
-    await log_channel.send(embed=embed)
+    state.log_dispatcher.post(embed)
 
 def get_channel_type(channel):
     if isinstance(channel, discord.TextChannel):
@@ -630,21 +1396,19 @@ def get_channel_type(channel):
 
 @bot.event
 async def on_guild_channel_create(channel):
-    log_channel = bot.get_channel(LOG_CHANNEL_ID)
-    if not isinstance(log_channel, discord.TextChannel):
+    state = await guild_states.get(channel.guild)
+    if state is None:
         return
 
+    state.resolver.forget_channel(channel)
+
     # Get channel type
     channel_type = get_channel_type(channel)
 
     # Get audit logs to find who created the channel
     creator = None
     try:
-        async for entry in channel.guild.audit_logs(limit=1, action=discord.AuditLogAction.channel_create):
-            if entry.target and isinstance(entry.target, discord.abc.GuildChannel):  # Ensure target exists and is a channel
-                if entry.target.id == channel.id:
-                    creator = entry.user
-                    break
+        creator = await audit_cache.resolve(channel.guild, discord.AuditLogAction.channel_create, channel.id)
     except discord.Forbidden:
         print("Bot lacks permission to view audit logs.")
     except discord.HTTPException as e:
@@ -665,25 +1429,23 @@ async def on_guild_channel_create(channel):
 
     embed.set_footer(text=f"Channel ID: {channel.id}")
 
-    await log_channel.send(embed=embed)
+    state.log_dispatcher.post(embed)
 
 @bot.event
 async def on_guild_channel_delete(channel):
-    log_channel = bot.get_channel(LOG_CHANNEL_ID)
-    if not isinstance(log_channel, discord.TextChannel):
+    state = await guild_states.get(channel.guild)
+    if state is None:
         return
 
+    state.resolver.forget_channel(channel)
+
     # Get channel type
     channel_type = get_channel_type(channel)
 
     # Get audit logs to find who deleted the channel
     deleter = None
     try:
-        async for entry in channel.guild.audit_logs(limit=1, action=discord.AuditLogAction.channel_delete):
-            if entry.target and isinstance(entry.target, discord.abc.GuildChannel):  # Ensure target exists and is a channel
-                if entry.target.id == channel.id:
-                    deleter = entry.user
-                    break
+        deleter = await audit_cache.resolve(channel.guild, discord.AuditLogAction.channel_delete, channel.id)
     except discord.Forbidden:
         print("Bot lacks permission to view audit logs.")
     except discord.HTTPException as e:
@@ -704,14 +1466,18 @@ async def on_guild_channel_delete(channel):
 
     embed.set_footer(text=f"Channel ID: {channel.id}")
 
-    await log_channel.send(embed=embed)
+    state.log_dispatcher.post(embed)
 
 @bot.event
 async def on_guild_channel_update(before, after):
-    log_channel = bot.get_channel(LOG_CHANNEL_ID)
-    if not isinstance(log_channel, discord.TextChannel):
+    state = await guild_states.get(after.guild)
+    if state is None:
         return
 
+    if before.name != after.name:
+        state.resolver.forget_channel(before)
+        state.resolver.forget_channel(after)
+
     # Determine channel type
     channel_type = get_channel_type(after)
 
@@ -725,10 +1491,7 @@ async def on_guild_channel_update(before, after):
     # updater = await get_updater(after)
     updater = None
     try:
-        async for entry in after.guild.audit_logs(limit=1, action=discord.AuditLogAction.channel_update):
-            if entry.target and isinstance(entry.target, discord.abc.GuildChannel):
-                if entry.target.id == after.id:
-                    updater = entry.user
+        updater = await audit_cache.resolve(after.guild, discord.AuditLogAction.channel_update, after.id)
     except (discord.Forbidden, discord.HTTPException):
         print("Bot lacks permission to view audit logs.")
 
@@ -743,7 +1506,7 @@ async def on_guild_channel_update(before, after):
         embed.add_field(name="Changes", value="No significant changes detected.", inline=False)
 
     embed.set_footer(text=f"Channel ID: {after.id}")
-    await log_channel.send(embed=embed)
+    state.log_dispatcher.post(embed)
 
 def get_channel_changes(before, after):
     changes = []
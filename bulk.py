@@ -0,0 +1,177 @@
+# Copyright (c) 2025, Arka Mondal. All rights reserved.
+# Use of this source code is governed by a BSD-style license that
+# can be found in the LICENSE file.
+
+import asyncio
+import json
+import os
+import time
+
+import discord
+
+from verifyqueue import TokenBucket
+
+
+class BulkJob:
+    """Applies one Discord call to many targets with bounded concurrency.
+
+    ``concurrency`` workers pull targets off a shared queue. discord.py
+    already waits on the per-route rate-limit bucket, so the workers only
+    keep that bucket busy; if a 429 still surfaces, every worker pauses
+    for the advertised retry-after and the target is tried again. With
+    ``rate`` set, the workers together start at most that many calls per
+    second, leaving the rest of the bucket to everything else the bot does.
+
+    Progress is checkpointed to ``<checkpoint_dir>/<name>.json`` while the
+    job runs, so an interrupted job can be picked up with ``resume``. The
+    checkpoint is removed once the job finishes.
+    """
+
+    def __init__(self, file_io, name, targets, meta=None, checkpoint_dir='jobs', concurrency=4, rate=None):
+        self.name = name
+        self.targets = list(targets)
+        self.meta = meta or {}
+        self.done = []
+        self.failed = []
+        self.changed = 0
+        self.concurrency = concurrency
+        self._budget = TokenBucket(rate, concurrency) if rate else None
+        self.path = os.path.join(checkpoint_dir, f'{name}.json')
+        self._io = file_io
+        self._pause_until = 0.0
+        self._pending = None
+
+    @classmethod
+    async def resume(cls, file_io, name, checkpoint_dir='jobs', concurrency=4, rate=None):
+        """Load an interrupted job, or return None if there is none."""
+        path = os.path.join(checkpoint_dir, f'{name}.json')
+        state = await file_io.run(_read_checkpoint, path)
+        if state is None:
+            return None
+
+        job = cls(file_io, name, state['remaining'], state['meta'], checkpoint_dir, concurrency, rate)
+        job.done = state['done']
+        job.failed = state['failed']
+        job.changed = state['changed']
+        return job
+
+    @property
+    def remaining(self):
+        if self._pending is not None:
+            return list(self._pending.values())
+        return self.targets
+
+    @property
+    def processed(self):
+        return len(self.done) + len(self.failed)
+
+    @property
+    def total(self):
+        remaining = len(self._pending) if self._pending is not None else len(self.targets)
+        return self.processed + remaining
+
+    async def run(self, action, progress=None, progress_interval=2.0, checkpoint_interval=5.0):
+        """Run ``await action(target)`` for every remaining target.
+
+        ``action`` returns True when it changed something and False when the
+        target needed nothing. ``progress`` is awaited with the job at most
+        once per ``progress_interval`` seconds and once more at the end.
+        """
+        queue = asyncio.Queue()
+        pending = self._pending = dict(enumerate(self.targets))
+        for item in pending.items():
+            queue.put_nowait(item)
+
+        async def worker():
+            while True:
+                try:
+                    index, target = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+
+                while True:
+                    delay = self._pause_until - time.monotonic()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                    if self._budget is not None:
+                        while wait := self._budget.take():
+                            await asyncio.sleep(wait)
+                    try:
+                        if await action(target):
+                            self.changed += 1
+                        self.done.append(target)
+                    except discord.HTTPException as e:
+                        if e.status == 429:
+                            retry_after = float(e.response.headers.get('Retry-After', 1))
+                            self._pause_until = max(self._pause_until, time.monotonic() + retry_after)
+                            continue
+                        self.failed.append([target, str(e)])
+                    except Exception as e:
+                        self.failed.append([target, str(e)])
+                    break
+
+                del pending[index]
+
+        async def reporter():
+            last_checkpoint = time.monotonic()
+            while True:
+                await asyncio.sleep(progress_interval)
+                if progress is not None:
+                    await _call_progress(progress, self)
+                if time.monotonic() - last_checkpoint >= checkpoint_interval:
+                    await self._checkpoint()
+                    last_checkpoint = time.monotonic()
+
+        await self._checkpoint()
+        report_task = asyncio.create_task(reporter())
+        try:
+            await asyncio.gather(*(worker() for _ in range(self.concurrency)))
+        finally:
+            report_task.cancel()
+            self.targets = list(pending.values())
+            self._pending = None
+            await self._checkpoint()
+
+        if progress is not None:
+            await _call_progress(progress, self)
+
+    async def finish(self):
+        """Forget the checkpoint once the caller has acted on the results."""
+        await self._io.write(_remove_checkpoint, self.path)
+
+    async def _checkpoint(self):
+        state = json.dumps({
+            'remaining': self.remaining,
+            'done': self.done,
+            'failed': self.failed,
+            'changed': self.changed,
+            'meta': self.meta,
+        })
+        await self._io.write(_write_checkpoint, self.path, state)
+
+
+async def _call_progress(progress, job):
+    try:
+        await progress(job)
+    except discord.HTTPException:
+        pass  # a lost progress update is not worth failing the job
+
+
+def _read_checkpoint(path):
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def _write_checkpoint(path, state):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        f.write(state)
+    os.replace(tmp_path, path)
+
+
+def _remove_checkpoint(path):
+    if os.path.exists(path):
+        os.remove(path)
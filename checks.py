@@ -0,0 +1,42 @@
+# Copyright (c) 2025, Arka Mondal. All rights reserved.
+# Use of this source code is governed by a BSD-style license that
+# can be found in the LICENSE file.
+
+from discord.ext import commands
+
+
+class GuardFailure(commands.CheckFailure):
+    """A failed check whose message is sent back to the invoking channel.
+
+    An empty message fails silently, as for guilds the bot does not serve.
+    """
+
+
+async def _state_of(ctx):
+    state = await ctx.bot.guild_states.get(ctx.guild)
+    if state is None:
+        raise GuardFailure('')
+    return state
+
+
+def is_organizer(message="You don't have permission to use this command. Organizer role required."):
+    """Only let members holding the guild's organizer role run the command."""
+    async def predicate(ctx):
+        state = await _state_of(ctx)
+        role = state.resolver.role(ctx.guild, state.config.organizer_role)
+        if role is None or ctx.author.get_role(role.id) is None:
+            raise GuardFailure(message)
+        return True
+    return commands.check(predicate)
+
+
+def in_channel(setting):
+    """Only run the command in the channel named by the guild config ``setting``."""
+    async def predicate(ctx):
+        state = await _state_of(ctx)
+        name = getattr(state.config, setting)
+        channel = state.resolver.channel(ctx.guild, name)
+        if channel is None or ctx.channel.id != channel.id:
+            raise GuardFailure(f"This command can only be used in the #{name} channel.")
+        return True
+    return commands.check(predicate)
@@ -0,0 +1,248 @@
+# Copyright (c) 2025, Arka Mondal. All rights reserved.
+# Use of this source code is governed by a BSD-style license that
+# can be found in the LICENSE file.
+
+import asyncio
+import json
+import os
+
+
+def read_claims(path):
+    """Return the claims stored at ``path``, journals included."""
+    claimed = {}
+    if os.path.exists(path) and os.path.getsize(path) > 0:
+        with open(path) as f:
+            claimed = json.load(f)
+
+    # the compacting journal is always older than the live one
+    for journal_path in (path + '.journal.compacting', path + '.journal'):
+        _replay(journal_path, claimed)
+
+    return claimed
+
+
+def _replay(path, claimed):
+    if not os.path.exists(path):
+        return
+
+    with open(path, 'rb') as f:
+        data = f.read()
+
+    # a crash in the middle of an append leaves a torn last line behind
+    for line in data.split(b'\n')[:-1]:
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue
+
+        if record['op'] == 'claim':
+            claimed[record['id']] = record['user']
+        elif record['op'] == 'unclaim':
+            claimed.pop(record['id'], None)
+
+
+class ClaimIndex:
+    """Bidirectional map between participant ids and Discord user ids.
+
+    Both directions are plain dicts updated together, so every lookup and
+    membership check is O(1) whichever side it starts from. User ids are
+    stored as strings, the same way ``claimed.json`` stores them.
+    """
+
+    def __init__(self, claimed=None):
+        self._by_id = {}
+        self._by_user = {}
+        self._listeners = []
+        if claimed:
+            for htbid, user_id in claimed.items():
+                self.claim(htbid, user_id)
+
+    def __len__(self):
+        return len(self._by_id)
+
+    def __contains__(self, htbid):
+        return htbid in self._by_id
+
+    def user_of(self, htbid):
+        return self._by_id.get(htbid)
+
+    def id_of(self, user_id):
+        return self._by_user.get(user_id)
+
+    def has_user(self, user_id):
+        return user_id in self._by_user
+
+    def items(self):
+        return self._by_id.items()
+
+    def users(self):
+        """Set-like view of every user id holding a claim."""
+        return self._by_user.keys()
+
+    def snapshot(self):
+        return dict(self._by_id)
+
+    def add_listener(self, callback):
+        """Call ``callback(user_id)`` whenever a user gains or loses a claim.
+
+        ``replace`` calls it once with None, meaning every user may have
+        changed.
+        """
+        self._listeners.append(callback)
+
+    def _notify(self, user_id):
+        for callback in self._listeners:
+            callback(user_id)
+
+    def claim(self, htbid, user_id):
+        old_user = self._by_id.get(htbid)
+        if old_user is not None:
+            del self._by_user[old_user]
+        old_id = self._by_user.get(user_id)
+        if old_id is not None:
+            del self._by_id[old_id]
+
+        self._by_id[htbid] = user_id
+        self._by_user[user_id] = htbid
+
+        if old_user is not None and old_user != user_id:
+            self._notify(old_user)
+        self._notify(user_id)
+
+    def unclaim(self, htbid):
+        """Drop a claim and return the user id that held it, if any."""
+        user_id = self._by_id.pop(htbid, None)
+        if user_id is not None:
+            del self._by_user[user_id]
+            self._notify(user_id)
+        return user_id
+
+    def replace(self, claimed):
+        listeners, self._listeners = self._listeners, []
+        self._by_id.clear()
+        self._by_user.clear()
+        for htbid, user_id in claimed.items():
+            self.claim(htbid, user_id)
+
+        self._listeners = listeners
+        self._notify(None)
+
+
+class ClaimJournal:
+    """Append-only journal of claim changes on top of a JSON snapshot.
+
+    The snapshot keeps the familiar ``claimed.json`` layout. Every claim and
+    unclaim is appended to ``<snapshot>.journal`` as one JSON line and
+    fsync'd on the ``FileIO`` writer, so a verification costs one small
+    write instead of rewriting the whole file. Once enough records pile up the journal is rotated to
+    ``<snapshot>.journal.compacting`` and the snapshot is rewritten off the
+    writer thread. Replaying a record is idempotent, which is what makes the
+    rotation safe to interrupt at any point.
+    """
+
+    def __init__(self, path, file_io, compact_every=500):
+        self.path = path
+        self.journal_path = path + '.journal'
+        self.compacting_path = path + '.journal.compacting'
+        self.compact_every = compact_every
+        self._io = file_io
+        self._fp = None
+        self._records = 0
+        self._compaction = None
+
+    async def load_claims(self):
+        """Replay snapshot and journals, compact them and return the claims."""
+        return await self._io.write(self._load)
+
+    async def record_claim(self, htbid, user_id):
+        await self._io.write(self._append, [{'op': 'claim', 'id': htbid, 'user': user_id}])
+
+    async def record_unclaim(self, htbids):
+        await self._io.write(self._append, [{'op': 'unclaim', 'id': htbid} for htbid in htbids])
+
+    async def replace_claims(self, claimed):
+        """Overwrite every claim with ``claimed``, e.g. when restoring a backup."""
+        if self._compaction is not None and not self._compaction.done():
+            # an older snapshot must not land on top of the replacement
+            await asyncio.wait([self._compaction])
+        await self._io.write(self._replace, dict(claimed))
+
+    def maybe_compact(self, claims):
+        """Start a background compaction once the journal is large enough.
+
+        ``claims`` must already include every change whose record has been
+        queued, so update the ``ClaimIndex`` before recording it.
+        """
+        if self._records < self.compact_every:
+            return
+        if self._compaction is not None and not self._compaction.done():
+            return
+
+        # queue the rotation in the same step as the snapshot, so records
+        # appended after it land in the live journal, not the one it drops
+        rotated = self._io.write(self._rotate)
+        self._compaction = asyncio.create_task(self._compact(claims.snapshot(), rotated))
+        self._compaction.add_done_callback(self._compaction_done)
+
+    def close(self):
+        if self._fp is not None:
+            self._fp.close()
+            self._fp = None
+
+    def _load(self):
+        claimed = read_claims(self.path)
+        self._write_snapshot(dict(claimed))
+        for path in (self.compacting_path, self.journal_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+        self._fp = open(self.journal_path, 'a')
+        self._records = 0
+        return claimed
+
+    def _replace(self, claimed):
+        self._write_snapshot(claimed)
+        if os.path.exists(self.compacting_path):
+            os.remove(self.compacting_path)
+        self._fp.close()
+        self._fp = open(self.journal_path, 'w')
+        self._records = 0
+
+    def _append(self, records):
+        if not records:
+            return
+        self._fp.write(''.join(json.dumps(record) + '\n' for record in records))
+        self._fp.flush()
+        os.fsync(self._fp.fileno())
+        self._records += len(records)
+
+    def _rotate(self):
+        # a leftover compacting journal means the last compaction failed;
+        # keep appending to the live journal and just retry the snapshot
+        if os.path.exists(self.compacting_path):
+            return
+        self._fp.close()
+        os.replace(self.journal_path, self.compacting_path)
+        self._fp = open(self.journal_path, 'a')
+        self._records = 0
+
+    async def _compact(self, snapshot, rotated):
+        # the rotation is queued behind every record already in ``snapshot``,
+        # so the compacting journal holds exactly the changes it covers
+        await rotated
+        await self._io.run(self._write_snapshot, snapshot)
+        await self._io.run(os.remove, self.compacting_path)
+
+    def _compaction_done(self, task):
+        if not task.cancelled() and task.exception() is not None:
+            print(f'Error: claim journal compaction failed: {task.exception()}')
+
+    def _write_snapshot(self, snapshot):
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(snapshot, f, indent=4)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
@@ -12,3 +12,22 @@ TOKEN: Final[str] = os.getenv("DISCORD_BOT_TOKEN", "")
 ROLE_ID: Final[str] = os.getenv("ROLE_ID", "0")
 LOG_CHANNEL_ID: Final[int] = int(os.getenv("LOG_CHANNEL_ID", "0"))
 WELCOME_CHANNEL_ID: Final[int] = int(os.getenv("WELCOME_CHANNEL_ID", "0"))
+# "json" keeps participants.json/claimed.json, "sqlite" uses DATABASE_PATH
+STORAGE_BACKEND: Final[str] = os.getenv("STORAGE_BACKEND", "json")
+DATABASE_PATH: Final[str] = os.getenv("DATABASE_PATH", "htbbot.db")
+BACKUP_DIR: Final[str] = os.getenv("BACKUP_DIR", "backup")
+BACKUP_INTERVAL: Final[int] = int(os.getenv("BACKUP_INTERVAL", "3600"))
+# JSON file of per-guild settings, see README; empty runs a single event
+GUILDS_CONFIG: Final[str] = os.getenv("GUILDS_CONFIG", "")
+# 0 uses the shard count recommended by Discord
+SHARD_COUNT: Final[int] = int(os.getenv("SHARD_COUNT", "0"))
+# how often participants.json is checked for changes, in seconds; 0 disables
+ROSTER_POLL_INTERVAL: Final[int] = int(os.getenv("ROSTER_POLL_INTERVAL", "30"))
+# memory budget and lifetime of the message content cache used by the logs;
+# MESSAGE_CACHE_SPILL names a SQLite file evicted messages are kept in
+MESSAGE_CACHE_MB: Final[int] = int(os.getenv("MESSAGE_CACHE_MB", "16"))
+MESSAGE_CACHE_TTL: Final[int] = int(os.getenv("MESSAGE_CACHE_TTL", "259200"))
+MESSAGE_CACHE_SPILL: Final[str] = os.getenv("MESSAGE_CACHE_SPILL", "")
+# Prometheus metrics are served on METRICS_HOST:METRICS_PORT/metrics; port 0 disables
+METRICS_HOST: Final[str] = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT: Final[int] = int(os.getenv("METRICS_PORT", "9108"))
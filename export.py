@@ -0,0 +1,130 @@
+# Copyright (c) 2025, Arka Mondal. All rights reserved.
+# Use of this source code is governed by a BSD-style license that
+# can be found in the LICENSE file.
+
+import csv
+import gzip
+import json
+import os
+import shutil
+import tempfile
+from itertools import islice
+
+import discord
+
+PAGE_SIZE = 15
+COMPRESS_ABOVE = 1 << 20
+FIELDS = ('id', 'name', 'email', 'user')
+
+
+def parse_filters(args):
+    """Parse ``[csv|jsonl] [verified|unverified|all] [name:<prefix>] [email:<prefix>]``.
+
+    Raises ValueError on anything else.
+    """
+    filters = {'format': 'csv', 'status': 'verified', 'name': '', 'email': ''}
+    for arg in args:
+        if arg in ('csv', 'jsonl'):
+            filters['format'] = arg
+        elif arg in ('verified', 'unverified', 'all'):
+            filters['status'] = arg
+        elif arg.startswith('name:'):
+            filters['name'] = arg[len('name:'):].lower()
+        elif arg.startswith('email:'):
+            filters['email'] = arg[len('email:'):].lower()
+        else:
+            raise ValueError(f'Unknown filter: {arg}')
+    return filters
+
+
+def iter_rows(entries, claimed, filters):
+    """Lazily yield ``(id, name, email, user)`` rows that pass ``filters``."""
+    status = filters['status']
+    for htbid, entry in entries:
+        user_id = claimed.get(htbid, '')
+        if status == 'verified' and not user_id:
+            continue
+        if status == 'unverified' and user_id:
+            continue
+        if filters['name'] and not entry['name'].lower().startswith(filters['name']):
+            continue
+        if filters['email'] and not entry['email'].lower().startswith(filters['email']):
+            continue
+        yield htbid, entry['name'], entry['email'], user_id
+
+
+def write_export(entries, claimed, filters):
+    """Stream the matching rows into a temporary file; return (path, rows).
+
+    Files above ``COMPRESS_ABOVE`` bytes are gzipped. The caller removes the
+    file once it has been uploaded.
+    """
+    suffix = '.' + filters['format']
+    fd, path = tempfile.mkstemp(prefix='htb-export-', suffix=suffix)
+    count = 0
+    with os.fdopen(fd, 'w', newline='') as f:
+        if filters['format'] == 'csv':
+            writer = csv.writer(f)
+            writer.writerow(FIELDS)
+            for row in iter_rows(entries, claimed, filters):
+                writer.writerow(row)
+                count += 1
+        else:
+            for row in iter_rows(entries, claimed, filters):
+                f.write(json.dumps(dict(zip(FIELDS, row))) + '\n')
+                count += 1
+
+    if os.path.getsize(path) > COMPRESS_ABOVE:
+        with open(path, 'rb') as fin, gzip.open(path + '.gz', 'wb') as fout:
+            shutil.copyfileobj(fin, fout)
+        os.remove(path)
+        path += '.gz'
+    return path, count
+
+
+def render_page(entries, claimed, filters, page, page_size=PAGE_SIZE):
+    """Return the lines of one page and whether another page follows it."""
+    rows = list(islice(iter_rows(entries, claimed, filters), page * page_size, (page + 1) * page_size + 1))
+    lines = [f'`{htbid}` {name} <{email}> ' + (f'-> `{user_id}`' if user_id else '(unverified)')
+             for htbid, name, email, user_id in rows[:page_size]]
+    return lines, len(rows) > page_size
+
+
+class ExportPager(discord.ui.View):
+    """Previous/next buttons over the filtered roster.
+
+    Only the page on screen is ever built; each flip walks the roster again
+    up to that page.
+    """
+
+    def __init__(self, author_id, render, timeout=300):
+        super().__init__(timeout=timeout)
+        self.author_id = author_id
+        self.render = render
+        self.page = 0
+        self.has_next = False
+
+    async def first_page(self):
+        return await self._content()
+
+    async def interaction_check(self, interaction):
+        return interaction.user.id == self.author_id
+
+    @discord.ui.button(label='Previous', style=discord.ButtonStyle.secondary)
+    async def previous(self, interaction, button):
+        self.page = max(0, self.page - 1)
+        await interaction.response.edit_message(content=await self._content(), view=self)
+
+    @discord.ui.button(label='Next', style=discord.ButtonStyle.secondary)
+    async def next(self, interaction, button):
+        if self.has_next:
+            self.page += 1
+        await interaction.response.edit_message(content=await self._content(), view=self)
+
+    async def _content(self):
+        lines, self.has_next = await self.render(self.page)
+        self.previous.disabled = self.page == 0
+        self.next.disabled = not self.has_next
+        if not lines:
+            return 'No participants match these filters.'
+        return f'**Page {self.page + 1}**\n' + '\n'.join(lines)
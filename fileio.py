@@ -0,0 +1,109 @@
+# Copyright (c) 2025, Arka Mondal. All rights reserved.
+# Use of this source code is governed by a BSD-style license that
+# can be found in the LICENSE file.
+
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class FileIO:
+    """Runs the bot's file I/O away from the event loop.
+
+    Reads go to a small thread pool. Writes are queued and executed one at a
+    time by a single writer task, so they hit the disk in the order they were
+    submitted. Callers only ever await a future.
+    """
+
+    def __init__(self, read_workers=2):
+        self._readers = ThreadPoolExecutor(max_workers=read_workers, thread_name_prefix='htb-read')
+        self._writer_thread = ThreadPoolExecutor(max_workers=1, thread_name_prefix='htb-write')
+        self._writes = None
+        self._writer = None
+
+    def start(self):
+        if self._writer is None:
+            self._writes = asyncio.Queue()
+            self._writer = asyncio.create_task(self._run_writer())
+
+    async def run(self, fn, *args):
+        """Run a read (or any write that needs no ordering) in the pool."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._readers, fn, *args)
+
+    @property
+    def pending_writes(self):
+        return self._writes.qsize() if self._writes is not None else 0
+
+    def write(self, fn, *args):
+        """Queue ``fn(*args)`` on the writer and return a future for it."""
+        self.start()
+        future = asyncio.get_running_loop().create_future()
+        self._writes.put_nowait((fn, args, future))
+        return future
+
+    async def close(self):
+        if self._writer is not None:
+            await self._writes.join()
+            self._writer.cancel()
+            self._writer = None
+        self._readers.shutdown(wait=True)
+        self._writer_thread.shutdown(wait=True)
+
+    async def _run_writer(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            fn, args, future = await self._writes.get()
+            try:
+                result = await loop.run_in_executor(self._writer_thread, fn, *args)
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+            else:
+                if not future.done():
+                    future.set_result(result)
+            finally:
+                self._writes.task_done()
+
+
+class LoopLagMonitor:
+    """Measures how long the event loop was blocked.
+
+    A task sleeps for ``interval`` seconds in a loop; whatever it oversleeps
+    by is time the loop spent running something else without yielding.
+    """
+
+    def __init__(self, interval=0.5, warn_after=0.25):
+        self.interval = interval
+        self.warn_after = warn_after
+        self.last = 0.0
+        self.max = 0.0
+        self.total_blocked = 0.0
+        self.samples = 0
+        self.started_at = None
+        self._task = None
+
+    def start(self):
+        if self._task is None:
+            self.started_at = time.monotonic()
+            self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - start - self.interval)
+
+            self.last = lag
+            self.max = max(self.max, lag)
+            self.total_blocked += lag
+            self.samples += 1
+
+            if lag > self.warn_after:
+                print(f'Warning: event loop was blocked for {lag * 1000:.0f} ms')
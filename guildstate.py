@@ -0,0 +1,265 @@
+# Copyright (c) 2025, Arka Mondal. All rights reserved.
+# Use of this source code is governed by a BSD-style license that
+# can be found in the LICENSE file.
+
+import asyncio
+import datetime
+import json
+import os
+
+import discord
+
+from backup import BackupStore
+from banindex import BanIndex
+from claimstore import ClaimIndex, ClaimJournal
+from joinstorm import JoinStormGate
+from logqueue import LogDispatcher
+from resolver import GuildResolver
+from roletracker import RoleTracker
+from roster import JSONRoster
+from sqlitestore import SQLiteStore
+
+
+class GuildConfig:
+    """Where one event guild keeps its roster and claims, and which role and
+    channels it uses."""
+
+    FIELDS = {
+        'storage': 'json',
+        'participants': 'participants.json',
+        'claimed': 'claimed.json',
+        'database': 'htbbot.db',
+        'backup_dir': 'backup',
+        'log_spill': 'log_spill.jsonl',
+        'participant_role': "'25 Participant",
+        'participant_role_id': 0,
+        'organizer_role': 'Organizer',
+        'alert_role_id': 0,
+        'log_channel_id': 0,
+        'welcome_channel_id': 0,
+        'verify_channel': 'verify',
+        'admin_channel': 'admin-bot-cmd-run',
+    }
+
+    def __init__(self, **values):
+        unknown = set(values) - set(self.FIELDS)
+        if unknown:
+            raise ValueError(f'Unknown guild config keys: {", ".join(sorted(unknown))}')
+        for name, default in self.FIELDS.items():
+            setattr(self, name, values.get(name, default))
+
+    def derive(self, **values):
+        merged = {name: getattr(self, name) for name in self.FIELDS}
+        merged.update(values)
+        return GuildConfig(**merged)
+
+
+def load_guild_configs(path, default):
+    """Read ``{"<guild id>": {...}}`` from ``path``; unset keys come from ``default``.
+
+    Raises ValueError if two guilds would keep their claims, backups or log
+    spill in the same place.
+    """
+    with open(path) as f:
+        raw = json.load(f)
+    configs = {int(guild_id): default.derive(**values) for guild_id, values in raw.items()}
+
+    owners = {}
+    for guild_id, config in configs.items():
+        names = ['claimed', 'backup_dir', 'log_spill'] + (['database'] if config.storage == 'sqlite' else [])
+        for name in names:
+            path = os.path.abspath(getattr(config, name))
+            other = owners.setdefault(path, guild_id)
+            if other != guild_id:
+                raise ValueError(f'Guilds {other} and {guild_id} both use {path}, give each guild its own {name}')
+    return configs
+
+
+class GuildState:
+    """Everything the bot keeps for one event guild."""
+
+    def __init__(self, key, config, bot, file_io, on_join_batch, backup_interval=3600, roster_poll=30):
+        self.key = key
+        self.config = config
+        self.backup_interval = backup_interval
+        self.roster_poll = roster_poll
+        self.claims = ClaimIndex()
+        # ids whose role grant is in flight, so two users cannot claim one
+        self.verifying = set()
+        # members whose role a bulk clear has removed before their claim
+        self.clearing = set()
+        self.role_tracker = RoleTracker(self.claims)
+        if config.storage == 'sqlite':
+            self.roster = self.claim_store = SQLiteStore(config.database, file_io, config.participants, config.claimed)
+        else:
+            self.roster = JSONRoster(config.participants, file_io)
+            self.claim_store = ClaimJournal(config.claimed, file_io)
+        self.log_dispatcher = LogDispatcher(bot, config.log_channel_id, file_io, config.log_spill)
+        self.backup_store = BackupStore(config.backup_dir)
+        self.backup_lock = asyncio.Lock()
+        self.roster_lock = asyncio.Lock()
+        self.ban_index = BanIndex()
+        self._ban_index_task = None
+        self.resolver = GuildResolver()
+        self.join_gate = JoinStormGate(lambda members: on_join_batch(self, members))
+        self._io = file_io
+        self._tasks = set()
+
+    async def load(self, guild):
+        await self.roster.load_roster()
+        self.claims.replace(await self.claim_store.load_claims())
+        self.log_dispatcher.start()
+        self.spawn(self._run_periodic_backups())
+        if self.roster_poll:
+            self.spawn(self._watch_roster(await self._io.run(self._roster_mtime)))
+        if guild.chunked:
+            self.seed(guild)
+
+    def seed(self, guild):
+        """Seed the role tracker from the member cache and page the ban list."""
+        role = self.participant_role(guild)
+        self.role_tracker.seed([str(member.id) for member in role.members] if role else [])
+        # load() seeds a chunked guild and on_ready seeds it again, page the
+        # ban list once unless an earlier load failed
+        loading = self._ban_index_task is not None and not self._ban_index_task.done()
+        if not self.ban_index.ready and not loading:
+            self._ban_index_task = self.spawn(self._load_ban_index(guild))
+
+    def job_name(self, name):
+        """Name of this guild's checkpoint for the bulk job ``name``."""
+        return f'{name}-{self.key}'
+
+    def participant_role(self, guild):
+        if self.config.participant_role_id:
+            return guild.get_role(int(self.config.participant_role_id))
+        return self.resolver.role(guild, self.config.participant_role)
+
+    def spawn(self, coro):
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def take_backup(self, manual=False):
+        async with self.backup_lock:
+            return await self._io.run(self.backup_store.snapshot, self.claims.snapshot(), None, manual)
+
+    async def restore_backup(self, name):
+        """Back up the current claims, then return the claims stored in ``name``."""
+        async with self.backup_lock:
+            # keep the current state restorable too; retention must not take
+            # the snapshot being restored with it
+            await self._io.run(self.backup_store.snapshot, self.claims.snapshot(), None, True, (name,))
+            return await self._io.run(self.backup_store.restore, name)
+
+    async def reload_roster(self):
+        """Apply the changes made to the participants file; return ``(added, changed, removed)``."""
+        async with self.roster_lock:
+            return await self.roster.reload()
+
+    async def close(self):
+        for task in list(self._tasks):
+            task.cancel()
+        await self.log_dispatcher.stop()
+
+    def close_stores(self):
+        self.claim_store.close()
+
+    async def _run_periodic_backups(self):
+        while True:
+            await asyncio.sleep(self.backup_interval)
+            try:
+                await self.take_backup()
+            except Exception as e:
+                print(f'Error: periodic backup of {self.key} failed: {e}')
+
+    def _roster_mtime(self):
+        try:
+            return os.stat(self.config.participants).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    async def _watch_roster(self, last):
+        while True:
+            await asyncio.sleep(self.roster_poll)
+            try:
+                mtime = await self._io.run(self._roster_mtime)
+                if mtime is None or mtime == last:
+                    continue
+                added, changed, removed = await self.reload_roster()
+            except (OSError, ValueError, KeyError) as e:
+                # most likely caught mid-write, try again on the next poll
+                print(f'Error: reloading the roster of {self.key} failed: {e}')
+                continue
+            last = mtime
+            if added or changed or removed:
+                embed = discord.Embed(
+                    title="Roster Reloaded",
+                    description=f"{len(added)} added, {len(changed)} changed, {len(removed)} removed",
+                    color=discord.Color.blue(),
+                    timestamp=datetime.datetime.now(datetime.UTC)
+                )
+                embed.set_footer(text=self.config.participants)
+                self.log_dispatcher.post(embed)
+
+    async def _load_ban_index(self, guild):
+        try:
+            await self.ban_index.load(guild)
+        except discord.HTTPException as e:
+            print(f"Failed to load the ban list: {e}")
+
+
+class GuildStates:
+    """Creates a ``GuildState`` the first time a guild needs one.
+
+    With per-guild configs, each configured guild gets its own state and any
+    other guild is ignored. Without them every guild shares one state built
+    from the default config, which is how a single-event bot runs.
+    """
+
+    def __init__(self, factory, default, configs=None):
+        self.factory = factory
+        self.default = default
+        self.configs = configs
+        self._states = {}
+        self._locks = {}
+
+    def key_of(self, guild_id):
+        if self.configs is None:
+            return 'default'
+        return guild_id if guild_id in self.configs else None
+
+    def peek(self, guild):
+        """Return the guild's state if it is already loaded."""
+        if guild is None:
+            return None
+        return self._states.get(self.key_of(guild.id))
+
+    async def get(self, guild):
+        """Return the guild's state, loading it first if needed."""
+        if guild is None:
+            return None
+        key = self.key_of(guild.id)
+        if key is None:
+            return None
+
+        state = self._states.get(key)
+        if state is not None:
+            return state
+
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            state = self._states.get(key)
+            if state is None:
+                config = self.default if self.configs is None else self.configs[key]
+                state = self.factory(key, config)
+                await state.load(guild)
+                self._states[key] = state
+        return state
+
+    def loaded(self):
+        return list(self._states.values())
+
+    async def close(self):
+        for state in self._states.values():
+            await state.close()
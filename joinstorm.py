@@ -0,0 +1,71 @@
+# Copyright (c) 2025, Arka Mondal. All rights reserved.
+# Use of this source code is governed by a BSD-style license that
+# can be found in the LICENSE file.
+
+import asyncio
+import time
+from collections import deque
+
+
+class JoinStormGate:
+    """Switches join handling to batches while members pour in.
+
+    The gate counts joins over the last ``window`` seconds. At ``enter_rate``
+    joins it enters storm mode, where joins are held back and every
+    ``flush_interval`` seconds all of them are handed to ``flush(members)``,
+    in groups of up to ``batch_size``. It leaves storm mode once the count falls
+    to ``exit_rate``; the gap between the two rates keeps it from flapping.
+    """
+
+    def __init__(self, flush, window=60, enter_rate=20, exit_rate=5, batch_size=25, flush_interval=10):
+        self.flush = flush
+        self.window = window
+        self.enter_rate = enter_rate
+        self.exit_rate = exit_rate
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.storm = False
+        self._joins = deque()
+        self._pending = []
+        self._flusher = None
+
+    def rate(self):
+        """Joins seen in the last ``window`` seconds."""
+        cutoff = time.monotonic() - self.window
+        while self._joins and self._joins[0] < cutoff:
+            self._joins.popleft()
+        return len(self._joins)
+
+    def join(self, member):
+        """Record a join; return True if the gate will announce it in a batch."""
+        self._joins.append(time.monotonic())
+        rate = self.rate()
+        if not self.storm and rate >= self.enter_rate:
+            self.storm = True
+        elif self.storm and rate <= self.exit_rate:
+            self.storm = False
+
+        if not self.storm:
+            return False
+
+        self._pending.append(member)
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.create_task(self._run())
+        return True
+
+    async def _run(self):
+        while self._pending:
+            await asyncio.sleep(self.flush_interval)
+            # flush everyone who joined during the interval, or a long storm
+            # falls further behind every interval
+            pending, self._pending = self._pending, []
+            for i in range(0, len(pending), self.batch_size):
+                batch = pending[i:i + self.batch_size]
+                try:
+                    await self.flush(batch)
+                except Exception as e:
+                    print(f'Error: failed to announce {len(batch)} joins: {e}')
+
+            # the storm is judged by joins, so re-check it while draining
+            if self.storm and self.rate() <= self.exit_rate:
+                self.storm = False
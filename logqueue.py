@@ -0,0 +1,189 @@
+# Copyright (c) 2025, Arka Mondal. All rights reserved.
+# Use of this source code is governed by a BSD-style license that
+# can be found in the LICENSE file.
+
+import asyncio
+import json
+import os
+
+import discord
+
+EMBEDS_PER_MESSAGE = 10
+EMBED_CHARS_PER_MESSAGE = 6000
+
+
+class LogDispatcher:
+    """Single consumer that packs audit log embeds into as few sends as possible.
+
+    Listeners ``post`` an embed and move on. The consumer waits ``linger``
+    seconds after the first embed of a burst, then sends up to ten embeds
+    (and at most 6000 embed characters) per message. The in-memory queue is
+    bounded; when it is full, or when a batch keeps failing to send, the
+    embeds are appended to a spill file on disk and replayed once the queue
+    has drained, so no audit record is dropped. After a failed send the
+    consumer pauses before sending or replaying anything, for ``backoff``
+    seconds doubling with every failure in a row up to ``max_backoff``.
+    """
+
+    def __init__(self, bot, channel_id, file_io, spill_path='log_spill.jsonl', maxsize=500, linger=1.0,
+                 backoff=5.0, max_backoff=300.0):
+        self.bot = bot
+        self.channel_id = channel_id
+        self.spill_path = spill_path
+        self.linger = linger
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.sent_messages = 0
+        self.sent_embeds = 0
+        self.spilled = 0
+        self._io = file_io
+        self._queue = asyncio.Queue(maxsize)
+        self._spill_pending = os.path.exists(spill_path)
+        self._in_flight = []
+        self._failures = 0
+        self._resume_at = 0.0
+        self._task = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    @property
+    def pending(self):
+        return self._queue.qsize()
+
+    def post(self, embed):
+        try:
+            self._queue.put_nowait(embed)
+        except asyncio.QueueFull:
+            self._spill([embed])
+
+    async def stop(self):
+        """Stop the consumer and spill whatever is still queued."""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+        leftover, self._in_flight = self._in_flight, []
+        while not self._queue.empty():
+            leftover.append(self._queue.get_nowait())
+        if leftover:
+            await self._spill(leftover)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        carry = []
+        while True:
+            # a failing channel is left alone for a while, what arrives in
+            # the meantime waits in the queue or spills when it is full
+            delay = self._resume_at - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+            if not carry and self._queue.empty() and self._spill_pending:
+                carry = await self._io.write(_drain_spill, self.spill_path)
+                carry = [discord.Embed.from_dict(data) for data in carry]
+                self._spill_pending = False
+
+            batch = carry[:EMBEDS_PER_MESSAGE]
+            carry = carry[EMBEDS_PER_MESSAGE:]
+            if not batch:
+                batch.append(await self._queue.get())
+
+            # let the rest of a burst arrive before sending
+            deadline = loop.time() + self.linger
+            while len(batch) < EMBEDS_PER_MESSAGE:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            self._in_flight = batch + carry
+            for message in _pack(batch):
+                sent = await self._send(message)
+                del self._in_flight[:len(message)]
+                if not sent:
+                    # the rest would fail the same way, spill it for the replay
+                    if self._in_flight:
+                        await self._spill(self._in_flight)
+                    carry = []
+                    break
+            self._in_flight = []
+
+    async def _send(self, embeds):
+        """Send one message; return False if it was spilled instead."""
+        channel = self.bot.get_channel(self.channel_id)
+        if not isinstance(channel, discord.TextChannel):
+            return True
+
+        for attempt in range(3):
+            try:
+                await channel.send(embeds=embeds)
+                self.sent_messages += 1
+                self.sent_embeds += len(embeds)
+                self._failures = 0
+                return True
+            except discord.Forbidden as e:
+                print(f'Failed to send log message: {e}')
+                break
+            except discord.HTTPException as e:
+                print(f'Failed to send log message: {e}')
+                await asyncio.sleep(2 ** attempt)
+
+        await self._spill(embeds)
+        delay = min(self.max_backoff, self.backoff * 2 ** self._failures)
+        self._failures += 1
+        self._resume_at = asyncio.get_running_loop().time() + delay
+        print(f'Pausing the log channel for {delay:.0f} seconds')
+        return False
+
+    def _spill(self, embeds):
+        self.spilled += len(embeds)
+        self._spill_pending = True
+        lines = ''.join(json.dumps(embed.to_dict()) + '\n' for embed in embeds)
+        return self._io.write(_append_spill, self.spill_path, lines)
+
+
+def _pack(embeds):
+    """Split embeds into messages that fit Discord's per-message limits."""
+    message = []
+    chars = 0
+    for embed in embeds:
+        size = len(embed)
+        if message and (len(message) == EMBEDS_PER_MESSAGE or chars + size > EMBED_CHARS_PER_MESSAGE):
+            yield message
+            message = []
+            chars = 0
+        message.append(embed)
+        chars += size
+    if message:
+        yield message
+
+
+def _append_spill(path, lines):
+    with open(path, 'a') as f:
+        f.write(lines)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _drain_spill(path):
+    if not os.path.exists(path):
+        return []
+
+    with open(path) as f:
+        lines = f.read().split('\n')
+    os.remove(path)
+
+    records = []
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            records.append(json.loads(line))
+        except ValueError:
+            continue
+    return records
@@ -0,0 +1,179 @@
+# Copyright (c) 2025, Arka Mondal. All rights reserved.
+# Use of this source code is governed by a BSD-style license that
+# can be found in the LICENSE file.
+
+import datetime
+import re
+import shlex
+
+import discord
+
+from bulk import BulkJob
+
+BULK_BAN_SIZE = 200
+MAX_DELETE_SECONDS = 7 * 86400
+
+
+def parse_selection(query):
+    """Parse the arguments of ``!htbmassban``.
+
+    ``joined:<minutes>`` joined within the last minutes, ``age:<days>``
+    account younger than that, ``name:<regex>`` name or display name
+    matches, bare user ids, ``delete:<hours>`` of messages to delete and
+    ``reason:<text>`` (quote it if it has spaces). Raises ValueError on
+    anything else or when nothing selects targets.
+    """
+    selection = {'joined': None, 'age': None, 'name': None, 'ids': [], 'delete': 0, 'reason': None}
+    for arg in shlex.split(query):
+        if arg.isdigit():
+            selection['ids'].append(int(arg))
+        elif arg.startswith('joined:'):
+            selection['joined'] = datetime.timedelta(minutes=float(arg[len('joined:'):]))
+        elif arg.startswith('age:'):
+            selection['age'] = datetime.timedelta(days=float(arg[len('age:'):]))
+        elif arg.startswith('name:'):
+            try:
+                selection['name'] = re.compile(arg[len('name:'):], re.IGNORECASE)
+            except re.error as e:
+                raise ValueError(f'Bad name pattern: {e}')
+        elif arg.startswith('delete:'):
+            selection['delete'] = min(int(float(arg[len('delete:'):]) * 3600), MAX_DELETE_SECONDS)
+        elif arg.startswith('reason:'):
+            selection['reason'] = arg[len('reason:'):]
+        else:
+            raise ValueError(f'Unknown selector: {arg}')
+
+    if not (selection['ids'] or selection['joined'] or selection['age'] or selection['name']):
+        raise ValueError('Select targets by joined:, age:, name: or user ids.')
+    return selection
+
+
+def describe_selection(selection):
+    parts = []
+    if selection['ids']:
+        parts.append(f"{len(selection['ids'])} listed ids")
+    if selection['joined']:
+        parts.append(f"joined in the last {selection['joined'].total_seconds() / 60:g} minutes")
+    if selection['age']:
+        parts.append(f"accounts younger than {selection['age'].total_seconds() / 86400:g} days")
+    if selection['name']:
+        parts.append(f"name matching `{selection['name'].pattern}`")
+    return ', '.join(parts)
+
+
+def _matches(member, selection, now):
+    if selection['joined'] and (member.joined_at is None or now - member.joined_at > selection['joined']):
+        return False
+    if selection['age'] and now - member.created_at > selection['age']:
+        return False
+    if selection['name'] and not (selection['name'].search(member.name)
+                                  or selection['name'].search(member.display_name)):
+        return False
+    return True
+
+
+def select_targets(guild, author, selection, now=None):
+    """Return ``(targets, protected)``.
+
+    ``targets`` are members (or ``discord.Object`` for listed ids that are
+    not in the guild) passing every selector; ``protected`` are members
+    that matched but that ``author`` may not ban.
+    """
+    now = now or discord.utils.utcnow()
+    if selection['ids']:
+        candidates = [guild.get_member(user_id) or discord.Object(id=user_id) for user_id in dict.fromkeys(selection['ids'])]
+    else:
+        candidates = guild.members
+
+    targets = []
+    protected = []
+    for member in candidates:
+        if not isinstance(member, discord.Member):
+            targets.append(member)
+            continue
+        if not _matches(member, selection, now):
+            continue
+        if member == author or member == guild.owner or member.bot \
+                or (member.top_role >= author.top_role and author != guild.owner):
+            protected.append(member)
+        else:
+            targets.append(member)
+    return targets, protected
+
+
+def describe_target(target):
+    if isinstance(target, discord.Member):
+        joined = target.joined_at.strftime('%Y-%m-%d %H:%M') if target.joined_at else '?'
+        return f"{target.id} {target} (joined {joined}, created {target.created_at:%Y-%m-%d})"
+    return f"{target.id} (not in server)"
+
+
+async def ban_all(guild, file_io, job_name, targets, reason, delete_seconds=0, progress=None):
+    """Ban every target; return ``(banned_ids, failed)`` with ``failed`` as ``[id, error]`` pairs.
+
+    Uses ``guild.bulk_ban`` two hundred users at a time where discord.py has
+    it, and a ``BulkJob`` of single bans for anything it could not take. Bulk
+    bans also need Manage Server, without it every target is banned singly.
+    ``progress(done, total)`` is awaited as bans complete.
+    """
+    ids = [target.id for target in targets]
+    banned = []
+    failed = []
+    rest = ids
+
+    if hasattr(guild, 'bulk_ban'):
+        rest = []
+        for i in range(0, len(targets), BULK_BAN_SIZE):
+            chunk = targets[i:i + BULK_BAN_SIZE]
+            try:
+                result = await guild.bulk_ban(chunk, reason=reason, delete_message_seconds=delete_seconds)
+            except discord.Forbidden:
+                # Ban Members alone is enough for single bans
+                rest += [target.id for target in targets[i:]]
+                break
+            except discord.HTTPException:
+                # nothing in the chunk was banned, try them one by one
+                rest += [target.id for target in chunk]
+                continue
+            banned += [user.id for user in result.banned]
+            failed += [[user.id, 'ban failed'] for user in result.failed]
+            if progress:
+                await progress(len(banned) + len(failed), len(ids))
+
+    if rest:
+        async def ban(user_id):
+            await guild.ban(discord.Object(id=user_id), reason=reason, delete_message_seconds=delete_seconds)
+            return True
+
+        async def job_progress(job):
+            await progress(len(banned) + len(failed) + job.processed, len(ids))
+
+        job = BulkJob(file_io, job_name, rest)
+        await job.run(ban, job_progress if progress else None)
+        await job.finish()
+        banned += job.done
+        failed += job.failed
+    return banned, failed
+
+
+class ConfirmView(discord.ui.View):
+    """Confirm/Cancel buttons only ``author_id`` may press."""
+
+    def __init__(self, author_id, timeout=120):
+        super().__init__(timeout=timeout)
+        self.author_id = author_id
+        self.confirmed = False
+
+    async def interaction_check(self, interaction):
+        return interaction.user.id == self.author_id
+
+    @discord.ui.button(label='Ban them', style=discord.ButtonStyle.danger)
+    async def confirm(self, interaction, button):
+        self.confirmed = True
+        await interaction.response.edit_message(view=None)
+        self.stop()
+
+    @discord.ui.button(label='Cancel', style=discord.ButtonStyle.secondary)
+    async def cancel(self, interaction, button):
+        await interaction.response.edit_message(content='Mass ban cancelled.', view=None)
+        self.stop()
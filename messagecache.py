@@ -0,0 +1,205 @@
+# Copyright (c) 2025, Arka Mondal. All rights reserved.
+# Use of this source code is governed by a BSD-style license that
+# can be found in the LICENSE file.
+
+import json
+import sqlite3
+import sys
+import time
+from collections import OrderedDict
+
+# rough per-record overhead of the slots object, its tuple and the dict entries
+RECORD_OVERHEAD = 240
+
+SPILL_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS messages (
+    message_id INTEGER PRIMARY KEY,
+    record TEXT NOT NULL
+);
+'''
+
+
+class CachedMessage:
+    """What the delete and edit logs need from a message."""
+
+    __slots__ = ('message_id', 'channel_id', 'author_id', 'content', 'attachments', 'stored', 'size')
+
+    def __init__(self, message_id, channel_id, author_id, content, attachments=()):
+        self.message_id = message_id
+        self.channel_id = channel_id
+        self.author_id = author_id
+        self.content = content
+        self.attachments = tuple(attachments)
+        self.stored = time.monotonic()
+        self.size = RECORD_OVERHEAD + sys.getsizeof(content) + sum(len(name) + len(url) for name, url in self.attachments)
+
+    @classmethod
+    def from_message(cls, message):
+        return cls(message.id, message.channel.id, message.author.id, message.content,
+                   ((a.filename, a.url) for a in message.attachments))
+
+    def to_json(self):
+        return json.dumps([self.channel_id, self.author_id, self.content, self.attachments])
+
+    @classmethod
+    def from_json(cls, message_id, data):
+        channel_id, author_id, content, attachments = json.loads(data)
+        return cls(message_id, channel_id, author_id, content, map(tuple, attachments))
+
+
+class MessageCache:
+    """Recent message content, bounded by memory and age.
+
+    Records live in one LRU ordered by when they were stored or last edited;
+    the least recent go once the total passes ``budget`` bytes, once they
+    are older than ``ttl`` seconds, or once their channel holds more than
+    ``per_channel`` of them. Evicted records are written to the optional
+    SQLite ``spill_path``, which keeps the newest ``spill_max`` of them.
+    """
+
+    def __init__(self, file_io, budget=16 << 20, ttl=3 * 86400, per_channel=5000, spill_path='', spill_max=500000):
+        self.budget = budget
+        self.ttl = ttl
+        self.per_channel = per_channel
+        self.spill_path = spill_path
+        self.spill_max = spill_max
+        self.size = 0
+        self.hits = 0
+        self.spill_hits = 0
+        self.misses = 0
+        self._io = file_io
+        self._records = OrderedDict()
+        self._channels = {}
+        self._spill = {}
+        self._conn = None
+
+    def __len__(self):
+        return len(self._records)
+
+    def put(self, record):
+        self._discard(record.message_id)
+        self._records[record.message_id] = record
+        self._channels.setdefault(record.channel_id, OrderedDict())[record.message_id] = None
+        self.size += record.size
+
+        channel = self._channels[record.channel_id]
+        if len(channel) > self.per_channel:
+            self._evict(next(iter(channel)))
+        self._expire()
+
+    def edit(self, message_id, channel_id, author_id, content):
+        """Store the new content; return the record as it was before, if known."""
+        before = self._records.get(message_id)
+        attachments = before.attachments if before else ()
+        self.put(CachedMessage(message_id, channel_id, author_id, content, attachments))
+        return before
+
+    async def pop(self, message_id):
+        """Remove and return the record of a deleted message, None if unknown."""
+        record = self._discard(message_id)
+        if record is not None:
+            self.hits += 1
+            return record
+
+        if self.spill_path:
+            data = self._spill.pop(message_id, None)
+            if data is not None:
+                record = CachedMessage.from_json(message_id, data)
+            else:
+                record = await self._io.write(self._spill_take, message_id)
+            if record is not None:
+                self.spill_hits += 1
+                return record
+        self.misses += 1
+        return None
+
+    async def get(self, message_id):
+        record = self._records.get(message_id)
+        if record is not None:
+            self.hits += 1
+            return record
+
+        if self.spill_path:
+            data = self._spill.get(message_id)
+            if data is not None:
+                record = CachedMessage.from_json(message_id, data)
+            else:
+                record = await self._io.write(self._spill_get, message_id)
+            if record is not None:
+                self.spill_hits += 1
+                return record
+        self.misses += 1
+        return None
+
+    def forget(self, message_ids):
+        for message_id in message_ids:
+            self._discard(message_id)
+
+    def hit_rate(self):
+        lookups = self.hits + self.spill_hits + self.misses
+        return (self.hits + self.spill_hits) / lookups if lookups else 0.0
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def _discard(self, message_id):
+        record = self._records.pop(message_id, None)
+        if record is None:
+            return None
+        self.size -= record.size
+        channel = self._channels[record.channel_id]
+        del channel[message_id]
+        if not channel:
+            del self._channels[record.channel_id]
+        return record
+
+    def _evict(self, message_id):
+        record = self._discard(message_id)
+        if self.spill_path:
+            self._spill[record.message_id] = record.to_json()
+
+    def _expire(self):
+        deadline = time.monotonic() - self.ttl
+        while self._records:
+            message_id, record = next(iter(self._records.items()))
+            if self.size <= self.budget and record.stored > deadline:
+                break
+            self._evict(message_id)
+
+        if len(self._spill) >= 100:
+            rows, self._spill = list(self._spill.items()), {}
+            self._io.write(self._spill_put, rows).add_done_callback(self._spill_done)
+
+    @staticmethod
+    def _spill_done(future):
+        if not future.cancelled() and future.exception():
+            print(f'Error: spilling cached messages failed: {future.exception()}')
+
+    # spill, only ever touched from the FileIO writer thread
+
+    def _spill_conn(self):
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.spill_path, check_same_thread=False)
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.executescript(SPILL_SCHEMA)
+        return self._conn
+
+    def _spill_put(self, rows):
+        with self._spill_conn() as conn:
+            conn.executemany('INSERT OR REPLACE INTO messages (message_id, record) VALUES (?, ?)', rows)
+            # message ids grow over time, so the smallest are the oldest
+            conn.execute('DELETE FROM messages WHERE message_id <= (SELECT message_id FROM messages '
+                         'ORDER BY message_id DESC LIMIT 1 OFFSET ?)', (self.spill_max,))
+
+    def _spill_get(self, message_id):
+        row = self._spill_conn().execute('SELECT record FROM messages WHERE message_id = ?', (message_id,)).fetchone()
+        return CachedMessage.from_json(message_id, row[0]) if row else None
+
+    def _spill_take(self, message_id):
+        record = self._spill_get(message_id)
+        if record is not None:
+            with self._spill_conn() as conn:
+                conn.execute('DELETE FROM messages WHERE message_id = ?', (message_id,))
+        return record
@@ -0,0 +1,209 @@
+# Copyright (c) 2025, Arka Mondal. All rights reserved.
+# Use of this source code is governed by a BSD-style license that
+# can be found in the LICENSE file.
+
+import re
+import time
+from bisect import bisect_left
+
+import aiohttp
+from aiohttp import web
+
+# seconds; covers a cached lookup up to a slow bulk job step
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_SNOWFLAKE = re.compile(r'/\d{15,}')
+_TOKEN = re.compile(r'/[\w-]{60,}')
+
+
+class Histogram:
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the ``q`` quantile."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float('inf')
+
+
+class Metrics:
+    """Counters, histograms and gauges, rendered in the Prometheus text format.
+
+    Series are keyed by metric name and a tuple of label values, so
+    recording is a dict lookup and an increment.
+    """
+
+    def __init__(self):
+        self._meta = {}
+        self._counters = {}
+        self._histograms = {}
+        self._gauges = {}
+
+    def describe(self, name, kind, help, labels=()):
+        self._meta[name] = (kind, help, labels)
+
+    def inc(self, name, labels=(), amount=1):
+        key = (name, labels)
+        self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name, labels, value):
+        histogram = self._histograms.get((name, labels))
+        if histogram is None:
+            histogram = self._histograms[(name, labels)] = Histogram()
+        histogram.observe(value)
+
+    def timer(self, name, labels=()):
+        return _Timer(self, name, labels)
+
+    def gauge(self, name, read):
+        """Report ``read()`` as ``name``; ``read`` returns a number or a {labels: value} dict."""
+        self._gauges[name] = read
+
+    def counter(self, name, labels=()):
+        return self._counters.get((name, labels), 0)
+
+    def series(self, name):
+        """Every ``(labels, histogram)`` recorded under ``name``."""
+        return [(labels, histogram) for (metric, labels), histogram in self._histograms.items() if metric == name]
+
+    def counters(self, name):
+        return [(labels, value) for (metric, labels), value in self._counters.items() if metric == name]
+
+    def render(self):
+        lines = []
+        by_name = {}
+        for (name, labels), value in self._counters.items():
+            by_name.setdefault(name, []).append((labels, value))
+        for name, series in sorted(by_name.items()):
+            self._header(lines, name, 'counter')
+            for labels, value in series:
+                lines.append(f'{name}{self._labels(name, labels)} {value}')
+
+        by_name = {}
+        for (name, labels), histogram in self._histograms.items():
+            by_name.setdefault(name, []).append((labels, histogram))
+        for name, series in sorted(by_name.items()):
+            self._header(lines, name, 'histogram')
+            for labels, histogram in series:
+                seen = 0
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    seen += count
+                    lines.append(f'{name}_bucket{self._labels(name, labels, le=bound)} {seen}')
+                lines.append(f'{name}_bucket{self._labels(name, labels, le="+Inf")} {histogram.count}')
+                lines.append(f'{name}_sum{self._labels(name, labels)} {histogram.sum}')
+                lines.append(f'{name}_count{self._labels(name, labels)} {histogram.count}')
+
+        for name, read in sorted(self._gauges.items()):
+            self._header(lines, name, 'gauge')
+            value = read()
+            if isinstance(value, dict):
+                for labels, item in value.items():
+                    lines.append(f'{name}{self._labels(name, labels)} {item}')
+            else:
+                lines.append(f'{name} {value}')
+        return '\n'.join(lines) + '\n'
+
+    def _header(self, lines, name, default_kind):
+        kind, help, _ = self._meta.get(name, (default_kind, '', ()))
+        if help:
+            lines.append(f'# HELP {name} {help}')
+        lines.append(f'# TYPE {name} {kind}')
+
+    def _labels(self, name, values, le=None):
+        names = self._meta.get(name, (None, None, ()))[2]
+        pairs = [f'{label}="{_escape(value)}"' for label, value in zip(names, values)]
+        if le is not None:
+            pairs.append(f'le="{le}"')
+        return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class _Timer:
+    __slots__ = ('metrics', 'name', 'labels', 'started')
+
+    def __init__(self, metrics, name, labels):
+        self.metrics = metrics
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.observe(self.name, self.labels, time.perf_counter() - self.started)
+
+
+def http_trace(metrics):
+    """An aiohttp ``TraceConfig`` counting Discord API calls and their 429 waits.
+
+    Routes are labelled with their ids and interaction tokens replaced, so
+    the number of series stays small.
+    """
+    metrics.describe('htbbot_http_requests_total', 'counter', 'Discord API requests', ('method', 'route', 'status'))
+    metrics.describe('htbbot_http_request_seconds', 'histogram', 'Discord API request latency', ('method',))
+    metrics.describe('htbbot_http_ratelimited_total', 'counter', 'Discord API 429 responses', ('route',))
+    metrics.describe('htbbot_http_retry_after_seconds_total', 'counter', 'Retry-After advertised by 429s')
+
+    async def on_request_start(session, context, params):
+        context.started = time.perf_counter()
+
+    async def on_request_end(session, context, params):
+        route = _TOKEN.sub('/:token', _SNOWFLAKE.sub('/:id', params.url.path))
+        status = params.response.status
+        metrics.inc('htbbot_http_requests_total', (params.method, route, str(status)))
+        metrics.observe('htbbot_http_request_seconds', (params.method,), time.perf_counter() - context.started)
+        if status == 429:
+            metrics.inc('htbbot_http_ratelimited_total', (route,))
+            metrics.inc('htbbot_http_retry_after_seconds_total', (),
+                        float(params.response.headers.get('Retry-After', 0)))
+
+    trace = aiohttp.TraceConfig()
+    trace.on_request_start.append(on_request_start)
+    trace.on_request_end.append(on_request_end)
+    return trace
+
+
+class MetricsServer:
+    """Serves ``/metrics`` on ``host:port``."""
+
+    def __init__(self, metrics, host='127.0.0.1', port=9108):
+        self.metrics = metrics
+        self.host = host
+        self.port = port
+        self._runner = None
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get('/metrics', self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def _handle(self, request):
+        return web.Response(text=self.metrics.render(), content_type='text/plain', charset='utf-8')
@@ -0,0 +1,152 @@
+# Copyright (c) 2025, Arka Mondal. All rights reserved.
+# Use of this source code is governed by a BSD-style license that
+# can be found in the LICENSE file.
+
+"""Salted scrypt hashes for participant passkeys.
+
+Usage: python passkeys.py <participants.json> <hashed-participants.json>
+"""
+
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import os
+import sys
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+from verifyqueue import QueueBusy
+
+from roster import iter_json_object
+
+SCRYPT_N = 2 ** 14
+SCRYPT_R = 8
+SCRYPT_P = 1
+PREFIX = 'scrypt$'
+
+
+def hash_passkey(passkey, n=SCRYPT_N, r=SCRYPT_R, p=SCRYPT_P):
+    salt = os.urandom(16)
+    digest = hashlib.scrypt(passkey.encode(), salt=salt, n=n, r=r, p=p, dklen=32)
+    return f'{PREFIX}{n}${r}${p}${base64.b64encode(salt).decode()}${base64.b64encode(digest).decode()}'
+
+
+def check_passkey(passkey, stored):
+    """Compare a passkey against a stored hash, or a plaintext legacy entry."""
+    if not stored.startswith(PREFIX):
+        return hmac.compare_digest(passkey.encode(), stored.encode())
+
+    n, r, p, salt, digest = stored[len(PREFIX):].split('$')
+    digest = base64.b64decode(digest)
+    candidate = hashlib.scrypt(passkey.encode(), salt=base64.b64decode(salt),
+                               n=int(n), r=int(r), p=int(p), dklen=len(digest))
+    return hmac.compare_digest(candidate, digest)
+
+
+class AttemptLimiter:
+    """Blocks a user after ``max_failures`` failed attempts within ``window`` seconds."""
+
+    def __init__(self, max_failures=5, window=300):
+        self.max_failures = max_failures
+        self.window = window
+        self._failures = {}
+
+    def retry_after(self, user_id):
+        """Seconds until ``user_id`` may try again, 0 if they may now."""
+        failures = self._failures.get(user_id)
+        if not failures:
+            return 0
+
+        now = time.monotonic()
+        while failures and failures[0] <= now - self.window:
+            failures.popleft()
+        if not failures:
+            del self._failures[user_id]
+            return 0
+
+        if len(failures) < self.max_failures:
+            return 0
+        return failures[0] + self.window - now
+
+    def failed(self, user_id):
+        self._failures.setdefault(user_id, deque()).append(time.monotonic())
+
+    def succeeded(self, user_id):
+        self._failures.pop(user_id, None)
+
+
+class PasskeyVerifier:
+    """Checks passkeys on a bounded thread pool.
+
+    scrypt is deliberately slow, so it runs on ``workers`` threads
+    (``hashlib.scrypt`` releases the GIL) and at most ``max_pending`` checks
+    may wait for a thread at any time; past that ``verify`` raises QueueBusy
+    instead of queueing more. Successful checks are remembered for
+    ``cache_ttl`` seconds, keyed by a keyed digest of the passkey and the
+    stored hash so the cache itself holds nothing reusable.
+    """
+
+    def __init__(self, workers=2, max_pending=64, cache_size=1024, cache_ttl=600):
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='htb-passkey')
+        self._capacity = workers + max_pending
+        self._in_flight = 0
+        self._cache = OrderedDict()
+        self._cache_size = cache_size
+        self._cache_ttl = cache_ttl
+        self._cache_key = os.urandom(32)
+
+    async def verify(self, htbid, passkey, stored):
+        # the stored hash is part of the key, so a rotated passkey or the same
+        # id in another guild's roster is checked again
+        key = (htbid, hashlib.blake2b(f'{passkey}\0{stored}'.encode(), key=self._cache_key).digest())
+        expires = self._cache.get(key)
+        if expires is not None:
+            if expires > time.monotonic():
+                self._cache.move_to_end(key)
+                return True
+            del self._cache[key]
+
+        if self._in_flight >= self._capacity:
+            raise QueueBusy('Verification is busy right now. Try again in a minute.', 60)
+        self._in_flight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            ok = await loop.run_in_executor(self._pool, check_passkey, passkey, stored)
+        finally:
+            self._in_flight -= 1
+
+        if ok:
+            self._cache[key] = time.monotonic() + self._cache_ttl
+            if len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+        return ok
+
+    def close(self):
+        self._pool.shutdown(wait=False)
+
+
+def hash_roster(src, dst):
+    """Copy a participants.json file with every plaintext passkey hashed."""
+    count = 0
+    with open(src, 'r') as fin, open(dst + '.tmp', 'w') as fout:
+        fout.write('{\n')
+        for email, value in iter_json_object(fin):
+            if not value['password'].startswith(PREFIX):
+                value['password'] = hash_passkey(value['password'])
+            fout.write(',\n' if count else '')
+            fout.write(f'    {json.dumps(email)}: {json.dumps(value)}')
+            count += 1
+        fout.write('\n}\n')
+    os.replace(dst + '.tmp', dst)
+    return count
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 3:
+        print(__doc__.strip().splitlines()[-1])
+        sys.exit(1)
+
+    print(f'Hashed {hash_roster(sys.argv[1], sys.argv[2])} passkeys.')
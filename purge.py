@@ -0,0 +1,181 @@
+# Copyright (c) 2025, Arka Mondal. All rights reserved.
+# Use of this source code is governed by a BSD-style license that
+# can be found in the LICENSE file.
+
+import asyncio
+import datetime
+import re
+import time
+
+import discord
+
+MAX_PURGE = 5000
+MAX_SCAN = 20000
+# Discord refuses to bulk delete messages older than 14 days; keep clear of the edge
+BULK_MAX_AGE = datetime.timedelta(days=14) - datetime.timedelta(minutes=5)
+BULK_SIZE = 100
+SINGLE_DELETE_INTERVAL = 1.0
+
+_MENTION = re.compile(r'<@!?(\d+)>')
+
+
+def _parse_time(value):
+    when = datetime.datetime.fromisoformat(value)
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=datetime.UTC)
+    return when
+
+
+def parse_purge_filters(args):
+    """Parse ``[user:<id>|@user] [contains:<text>] [attachments] [after:<time>] [before:<time>]``.
+
+    Times are ISO dates or datetimes in UTC. Raises ValueError on anything else.
+    """
+    filters = {'user': None, 'contains': '', 'attachments': False, 'after': None, 'before': None}
+    for arg in args:
+        mention = _MENTION.fullmatch(arg)
+        if mention:
+            filters['user'] = int(mention.group(1))
+        elif arg.startswith('user:'):
+            value = arg[len('user:'):]
+            mention = _MENTION.fullmatch(value)
+            filters['user'] = int(mention.group(1) if mention else value)
+        elif arg.startswith('contains:'):
+            filters['contains'] = arg[len('contains:'):].lower()
+        elif arg == 'attachments':
+            filters['attachments'] = True
+        elif arg.startswith('after:'):
+            filters['after'] = _parse_time(arg[len('after:'):])
+        elif arg.startswith('before:'):
+            filters['before'] = _parse_time(arg[len('before:'):])
+        else:
+            raise ValueError(f'Unknown filter: {arg}')
+    return filters
+
+
+def describe_filters(filters):
+    parts = []
+    if filters['user'] is not None:
+        parts.append(f"from <@{filters['user']}>")
+    if filters['contains']:
+        parts.append(f"containing `{filters['contains']}`")
+    if filters['attachments']:
+        parts.append('with attachments')
+    if filters['after']:
+        parts.append(f"after {filters['after']:%Y-%m-%d %H:%M} UTC")
+    if filters['before']:
+        parts.append(f"before {filters['before']:%Y-%m-%d %H:%M} UTC")
+    return ', '.join(parts) or 'any message'
+
+
+def matches(message, filters):
+    if filters['user'] is not None and message.author.id != filters['user']:
+        return False
+    if filters['contains'] and filters['contains'] not in message.content.lower():
+        return False
+    if filters['attachments'] and not message.attachments:
+        return False
+    return True
+
+
+class PurgeTracker:
+    """Ids of messages deleted by a purge, so their delete events are not logged one by one.
+
+    Ids are kept for ``grace`` seconds after the delete, long enough for the
+    gateway event to arrive.
+    """
+
+    def __init__(self, grace=60):
+        self.grace = grace
+        self._ids = set()
+
+    def add(self, message_ids):
+        self._ids.update(message_ids)
+
+    def release(self, message_ids):
+        asyncio.get_running_loop().call_later(self.grace, self._ids.difference_update, list(message_ids))
+
+    def __contains__(self, message_id):
+        return message_id in self._ids
+
+
+class PurgeResult:
+    def __init__(self):
+        self.scanned = 0
+        self.bulk = 0
+        self.single = 0
+        self.failed = 0
+
+    @property
+    def deleted(self):
+        return self.bulk + self.single
+
+
+async def purge(channel, amount, filters, tracker, progress=None, progress_interval=2.0, skip=()):
+    """Delete up to ``amount`` messages in ``channel`` that pass ``filters``.
+
+    History is walked newest first, one page at a time. Messages younger
+    than 14 days are bulk deleted a hundred at a time; older ones can only
+    be deleted one by one, paced at ``SINGLE_DELETE_INTERVAL``. At most
+    ``MAX_SCAN`` messages are looked at. Returns a ``PurgeResult``.
+    """
+    result = PurgeResult()
+    batch = []
+    matched = 0
+    last_progress = time.monotonic()
+
+    async def flush():
+        tracker.add(message.id for message in batch)
+        try:
+            await channel.delete_messages(batch)
+            result.bulk += len(batch)
+        except discord.NotFound:
+            # one of them is already gone, fall back to deleting them singly
+            for message in batch:
+                await delete_single(message)
+        finally:
+            tracker.release(message.id for message in batch)
+            batch.clear()
+
+    async def delete_single(message):
+        tracker.add((message.id,))
+        try:
+            await message.delete()
+            result.single += 1
+        except discord.NotFound:
+            pass
+        except discord.Forbidden:
+            raise
+        except discord.HTTPException:
+            result.failed += 1
+        finally:
+            tracker.release((message.id,))
+        await asyncio.sleep(SINGLE_DELETE_INTERVAL)
+
+    cutoff = discord.utils.utcnow() - BULK_MAX_AGE
+    async for message in channel.history(limit=MAX_SCAN, before=filters['before'], after=filters['after'],
+                                         oldest_first=False):
+        result.scanned += 1
+        if message.id in skip or not matches(message, filters):
+            continue
+
+        if message.created_at > cutoff:
+            batch.append(message)
+            if len(batch) == BULK_SIZE:
+                await flush()
+        else:
+            if batch:
+                await flush()
+            await delete_single(message)
+
+        matched += 1
+        if matched >= amount:
+            break
+
+        if progress and time.monotonic() - last_progress >= progress_interval:
+            last_progress = time.monotonic()
+            await progress(result)
+
+    if batch:
+        await flush()
+    return result
@@ -0,0 +1,23 @@
+# Copyright (c) 2025, Arka Mondal. All rights reserved.
+# Use of this source code is governed by a BSD-style license that
+# can be found in the LICENSE file.
+
+import io
+
+import discord
+
+MESSAGE_LIMIT = 2000
+
+
+async def send_report(destination, summary, details='', filename='report.txt'):
+    """Send ``summary`` and ``details`` as one message.
+
+    When the two together do not fit in a Discord message, only the summary
+    is sent as text and the full report goes along as a file attachment.
+    """
+    text = f'{summary}\n{details}' if details else summary
+    if len(text) <= MESSAGE_LIMIT:
+        return await destination.send(text)
+
+    attachment = discord.File(io.BytesIO(text.encode()), filename=filename)
+    return await destination.send(summary[:MESSAGE_LIMIT], file=attachment)
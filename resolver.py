@@ -0,0 +1,61 @@
+# Copyright (c) 2025, Arka Mondal. All rights reserved.
+# Use of this source code is governed by a BSD-style license that
+# can be found in the LICENSE file.
+
+import discord
+
+
+class GuildResolver:
+    """Looks up a guild's roles and channels by name, caching their ids.
+
+    A cached id is turned back into the object with the guild's own id
+    lookup, so only the first use of a name (or the first one after the
+    object is renamed, created or deleted) scans the guild. The role and
+    channel listeners call ``forget_role``/``forget_channel`` to drop
+    stale entries.
+    """
+
+    def __init__(self):
+        self._roles = {}
+        self._channels = {}
+
+    def role(self, guild, name):
+        role_id = self._roles.get(name)
+        if role_id is not None:
+            role = guild.get_role(role_id)
+            if role is not None and role.name == name:
+                return role
+
+        role = discord.utils.get(guild.roles, name=name)
+        self._cache(self._roles, name, role)
+        return role
+
+    def channel(self, guild, name):
+        channel_id = self._channels.get(name)
+        if channel_id is not None:
+            channel = guild.get_channel(channel_id)
+            if channel is not None and channel.name == name:
+                return channel
+
+        channel = discord.utils.get(guild.channels, name=name)
+        self._cache(self._channels, name, channel)
+        return channel
+
+    def forget_role(self, role):
+        self._forget(self._roles, role)
+
+    def forget_channel(self, channel):
+        self._forget(self._channels, channel)
+
+    @staticmethod
+    def _cache(cache, name, obj):
+        if obj is None:
+            cache.pop(name, None)
+        else:
+            cache[name] = obj.id
+
+    @staticmethod
+    def _forget(cache, obj):
+        cache.pop(obj.name, None)
+        for name in [name for name, obj_id in cache.items() if obj_id == obj.id]:
+            del cache[name]
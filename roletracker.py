@@ -0,0 +1,66 @@
+# Copyright (c) 2025, Arka Mondal. All rights reserved.
+# Use of this source code is governed by a BSD-style license that
+# can be found in the LICENSE file.
+
+CLAIMED_WITHOUT_ROLE = 'claimed_but_not_recv'
+ROLE_WITHOUT_CLAIM = 'has_role_but_not_claimed'
+
+
+class RoleTracker:
+    """Live set of participant role holders and their drift from the claims.
+
+    Seeded once from the member cache, then kept current one user at a time
+    from member updates and claim changes, so both drift sets are always
+    ready without scanning the guild.
+    """
+
+    def __init__(self, claims):
+        self.claims = claims
+        self.holders = set()
+        self.drift = {CLAIMED_WITHOUT_ROLE: set(), ROLE_WITHOUT_CLAIM: set()}
+        self.ready = False
+        claims.add_listener(self.touch)
+
+    def seed(self, holder_ids):
+        self.holders = set(holder_ids)
+        self.ready = True
+        self.touch(None)
+
+    def set_holder(self, user_id, has_role):
+        """Record a role change; return the drift kind it leads to, if any."""
+        if has_role:
+            self.holders.add(user_id)
+        else:
+            self.holders.discard(user_id)
+        return self.touch(user_id)
+
+    def touch(self, user_id):
+        """Recompute the drift of ``user_id``, or of everyone if None."""
+        if not self.ready:
+            return None
+
+        if user_id is None:
+            self.drift[CLAIMED_WITHOUT_ROLE] = set(self.claims.users() - self.holders)
+            self.drift[ROLE_WITHOUT_CLAIM] = self.holders - self.claims.users()
+            return None
+
+        for members in self.drift.values():
+            members.discard(user_id)
+
+        claimed = self.claims.has_user(user_id)
+        holds = user_id in self.holders
+        if claimed and not holds:
+            kind = CLAIMED_WITHOUT_ROLE
+        elif holds and not claimed:
+            kind = ROLE_WITHOUT_CLAIM
+        else:
+            return None
+
+        self.drift[kind].add(user_id)
+        return kind
+
+    def drift_of(self, user_id):
+        for kind, members in self.drift.items():
+            if user_id in members:
+                return kind
+        return None
@@ -0,0 +1,129 @@
+# Copyright (c) 2025, Arka Mondal. All rights reserved.
+# Use of this source code is governed by a BSD-style license that
+# can be found in the LICENSE file.
+
+import json
+import re
+
+_WHITESPACE = re.compile(r'\s*')
+
+
+def iter_json_object(f, chunk_size=1 << 16):
+    """Yield the ``(key, value)`` pairs of a top-level JSON object.
+
+    Only one chunk of the file plus the entry being decoded is held in
+    memory, so a roster can be imported without loading all of it.
+    """
+    decoder = json.JSONDecoder()
+    buf = ''
+    pos = 0
+
+    def more():
+        nonlocal buf, pos
+        chunk = f.read(chunk_size)
+        if not chunk:
+            return False
+        buf = buf[pos:] + chunk
+        pos = 0
+        return True
+
+    def punct():
+        nonlocal pos
+        while True:
+            pos = _WHITESPACE.match(buf, pos).end()
+            if pos < len(buf):
+                pos += 1
+                return buf[pos - 1]
+            if not more():
+                raise ValueError('Unexpected end of JSON input')
+
+    def value():
+        nonlocal pos
+        while True:
+            pos = _WHITESPACE.match(buf, pos).end()
+            try:
+                val, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if not more():
+                    raise
+                continue
+            # a number that ends the chunk may continue in the next one
+            if end == len(buf) and more():
+                continue
+            pos = end
+            return val
+
+    if punct() != '{':
+        raise ValueError('Expected a JSON object')
+    if punct() == '}':
+        return
+    pos -= 1
+
+    while True:
+        key = value()
+        if punct() != ':':
+            raise ValueError(f'Expected ":" after key {key!r}')
+        yield key, value()
+
+        sep = punct()
+        if sep == '}':
+            return
+        if sep != ',':
+            raise ValueError(f'Expected "," or "}}" after key {key!r}')
+
+
+def iter_participants(path):
+    """Yield ``(id, email, name, password)`` from a participants.json file."""
+    with open(path, 'r') as f:
+        for email, value in iter_json_object(f):
+            yield value['id'], email, value['name'], value['password']
+
+
+def load_participants(path):
+    return {htbid: {'email': email, 'name': name, 'password': password}
+            for htbid, email, name, password in iter_participants(path)}
+
+
+def diff_roster(old, new):
+    """Return the ids ``(added, changed, removed)`` going from ``old`` to ``new``."""
+    added = [htbid for htbid in new if htbid not in old]
+    changed = [htbid for htbid, entry in new.items() if htbid in old and old[htbid] != entry]
+    removed = [htbid for htbid in old if htbid not in new]
+    return added, changed, removed
+
+
+class JSONRoster:
+    """Participant roster kept in memory, loaded from participants.json."""
+
+    def __init__(self, path, file_io):
+        self.path = path
+        self._io = file_io
+        self._id_map = {}
+
+    async def load_roster(self):
+        self._id_map = await self._io.run(load_participants, self.path)
+
+    async def reload(self):
+        """Re-read the roster file and apply only the entries that changed.
+
+        The file is parsed and diffed on a ``FileIO`` thread; the changes are
+        then applied in one step on the event loop, so lookups never see a
+        half-loaded roster. Returns ``(added, changed, removed)`` ids.
+        """
+        new = await self._io.run(load_participants, self.path)
+        added, changed, removed = await self._io.run(diff_roster, self._id_map, new)
+        for htbid in added + changed:
+            self._id_map[htbid] = new[htbid]
+        for htbid in removed:
+            del self._id_map[htbid]
+        return added, changed, removed
+
+    async def get(self, htbid):
+        return self._id_map.get(htbid)
+
+    async def scan(self, consumer):
+        """Run ``consumer(entries)`` off the event loop and return its result.
+
+        ``entries`` yields ``(id, entry)`` pairs in roster order.
+        """
+        return await self._io.run(consumer, list(self._id_map.items()))
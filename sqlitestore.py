@@ -0,0 +1,233 @@
+# Copyright (c) 2025, Arka Mondal. All rights reserved.
+# Use of this source code is governed by a BSD-style license that
+# can be found in the LICENSE file.
+
+"""SQLite storage for the participant roster and the claims.
+
+Usage: python sqlitestore.py <database> <participants.json> [claimed.json]
+"""
+
+import os
+import sqlite3
+import sys
+import threading
+from itertools import islice
+
+from claimstore import read_claims
+from roster import diff_roster, iter_participants, load_participants
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS participants (
+    id TEXT PRIMARY KEY,
+    email TEXT NOT NULL,
+    name TEXT NOT NULL,
+    password TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS claims (
+    participant_id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+'''
+
+IMPORT_BATCH = 1000
+
+
+class SQLiteStore:
+    """Roster and claim store backed by one SQLite database in WAL mode.
+
+    Both tables are keyed for the lookups the bot makes: participants by id,
+    claims by participant id with a unique index on the Discord user id.
+    Only the claims are mirrored in memory (by ``ClaimIndex``); participant
+    rows are queried on demand. Every query runs on a ``FileIO`` thread with
+    a connection of its own, writes go through the single writer.
+
+    The JSON files are imported once per database; the ``meta`` table
+    records each import, so emptied tables stay empty across restarts.
+    """
+
+    def __init__(self, path, file_io, participants_path=None, claimed_path=None):
+        self.path = path
+        self.participants_path = participants_path
+        self.claimed_path = claimed_path
+        self._io = file_io
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=FULL')
+            conn.executescript(SCHEMA)
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    # roster
+
+    async def load_roster(self):
+        """Import the JSON roster the first time the database is used.
+
+        On later starts the changes made to participants.json while the bot
+        was down are applied instead, as ``reload`` would.
+        """
+        if not self.participants_path:
+            return
+        if not await self._io.write(self._load_roster) and await self._io.run(os.path.exists, self.participants_path):
+            await self.reload()
+
+    async def reload(self):
+        """Re-read participants.json and write only the rows that changed.
+
+        Returns ``(added, changed, removed)`` ids.
+        """
+        new = await self._io.run(load_participants, self.participants_path)
+        return await self._io.write(self._apply_roster, new)
+
+    async def get(self, htbid):
+        return await self._io.run(self._get, htbid)
+
+    async def scan(self, consumer):
+        """Run ``consumer(entries)`` off the event loop and return its result.
+
+        ``entries`` streams ``(id, entry)`` pairs straight from the database.
+        """
+        return await self._io.run(lambda: consumer(self._iter_entries()))
+
+    def _iter_entries(self):
+        cursor = self._conn().execute('SELECT id, email, name, password FROM participants ORDER BY rowid')
+        while True:
+            rows = cursor.fetchmany(IMPORT_BATCH)
+            if not rows:
+                return
+            for htbid, email, name, password in rows:
+                yield htbid, {'email': email, 'name': name, 'password': password}
+
+    def _load_roster(self):
+        """Import the roster unless it was imported before; return True if it imported it."""
+        if self._imported('participants'):
+            return False
+        self.import_participants(self.participants_path)
+        return True
+
+    def _get(self, htbid):
+        row = self._conn().execute('SELECT email, name, password FROM participants WHERE id = ?', (htbid,)).fetchone()
+        if row is None:
+            return None
+        return {'email': row[0], 'name': row[1], 'password': row[2]}
+
+    def _apply_roster(self, new):
+        added, changed, removed = diff_roster(dict(self._iter_entries()), new)
+        with self._conn() as conn:
+            conn.executemany('INSERT OR REPLACE INTO participants (id, email, name, password) VALUES (?, ?, ?, ?)',
+                             ((htbid, new[htbid]['email'], new[htbid]['name'], new[htbid]['password'])
+                              for htbid in added + changed))
+            conn.executemany('DELETE FROM participants WHERE id = ?', ((htbid,) for htbid in removed))
+        return added, changed, removed
+
+    def import_participants(self, path):
+        """Stream a participants.json file into the database in batches."""
+        conn = self._conn()
+        rows = iter_participants(path)
+        count = 0
+        with conn:
+            while True:
+                batch = list(islice(rows, IMPORT_BATCH))
+                if not batch:
+                    break
+                conn.executemany('INSERT OR REPLACE INTO participants (id, email, name, password) VALUES (?, ?, ?, ?)', batch)
+                count += len(batch)
+            _mark_imported(conn, 'participants')
+        return count
+
+    # claims
+
+    async def load_claims(self):
+        """Return every claim, importing claimed.json on first use."""
+        return await self._io.write(self._load_claims)
+
+    async def record_claim(self, htbid, user_id):
+        await self._io.write(self._record_claim, htbid, user_id)
+
+    async def record_unclaim(self, htbids):
+        await self._io.write(self._record_unclaim, list(htbids))
+
+    async def replace_claims(self, claimed):
+        await self._io.write(self._replace_claims, dict(claimed))
+
+    def maybe_compact(self, claims):
+        # every claim is its own transaction already, nothing to compact
+        pass
+
+    def close(self):
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+
+    def _load_claims(self):
+        conn = self._conn()
+        if not self._imported('claims'):
+            if self.claimed_path and os.path.exists(self.claimed_path):
+                self.import_claims(self.claimed_path)
+            else:
+                with conn:
+                    _mark_imported(conn, 'claims')
+        return dict(conn.execute('SELECT participant_id, user_id FROM claims'))
+
+    def import_claims(self, path):
+        conn = self._conn()
+        claimed = read_claims(path)
+        with conn:
+            conn.executemany('INSERT OR REPLACE INTO claims (participant_id, user_id) VALUES (?, ?)', claimed.items())
+            _mark_imported(conn, 'claims')
+        return len(claimed)
+
+    def _imported(self, table):
+        """Whether ``table`` was imported; a table with rows from before the
+        ``meta`` table counts as imported and is marked so."""
+        conn = self._conn()
+        if conn.execute('SELECT 1 FROM meta WHERE key = ?', (f'{table}_imported',)).fetchone():
+            return True
+        if conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0] == 0:
+            return False
+        with conn:
+            _mark_imported(conn, table)
+        return True
+
+    def _replace_claims(self, claimed):
+        with self._conn() as conn:
+            conn.execute('DELETE FROM claims')
+            conn.executemany('INSERT INTO claims (participant_id, user_id) VALUES (?, ?)', claimed.items())
+
+    def _record_claim(self, htbid, user_id):
+        with self._conn() as conn:
+            conn.execute('DELETE FROM claims WHERE user_id = ?', (user_id,))
+            conn.execute('INSERT OR REPLACE INTO claims (participant_id, user_id) VALUES (?, ?)', (htbid, user_id))
+
+    def _record_unclaim(self, htbids):
+        with self._conn() as conn:
+            conn.executemany('DELETE FROM claims WHERE participant_id = ?', ((htbid,) for htbid in htbids))
+
+
+def _mark_imported(conn, table):
+    conn.execute('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', (f'{table}_imported', '1'))
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 3:
+        print(__doc__.strip().splitlines()[-1])
+        sys.exit(1)
+
+    store = SQLiteStore(sys.argv[1], None)
+    print(f'Imported {store.import_participants(sys.argv[2])} participants.')
+    if len(sys.argv) > 3:
+        print(f'Imported {store.import_claims(sys.argv[3])} claims.')
+    store.close()
@@ -0,0 +1,47 @@
+# Copyright (c) 2025, Arka Mondal. All rights reserved.
+# Use of this source code is governed by a BSD-style license that
+# can be found in the LICENSE file.
+
+import asyncio
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from claimstore import ClaimIndex, ClaimJournal, read_claims
+from fileio import FileIO
+
+
+class ClaimJournalCompactionTest(unittest.TestCase):
+    def test_claims_recorded_during_compaction_survive(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'claimed.json')
+            claims = ClaimIndex()
+
+            async def run():
+                file_io = FileIO()
+                journal = ClaimJournal(path, file_io, compact_every=10)
+                claims.replace(await journal.load_claims())
+
+                async def verifier(worker):
+                    for i in range(worker, 600, 20):
+                        claims.claim(f'HTB{i:04d}', str(1000 + i))
+                        await journal.record_claim(f'HTB{i:04d}', str(1000 + i))
+                        journal.maybe_compact(claims)
+
+                # staggered claims keep appending while compactions are in flight
+                await asyncio.gather(*(verifier(worker) for worker in range(20)))
+                if journal._compaction is not None:
+                    await journal._compaction
+                journal.close()
+                await file_io.close()
+
+            asyncio.run(run())
+            self.assertEqual(read_claims(path), claims.snapshot())
+            self.assertEqual(len(read_claims(path)), 600)
+
+
+if __name__ == '__main__':
+    unittest.main()
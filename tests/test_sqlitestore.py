@@ -0,0 +1,70 @@
+# Copyright (c) 2025, Arka Mondal. All rights reserved.
+# Use of this source code is governed by a BSD-style license that
+# can be found in the LICENSE file.
+
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from fileio import FileIO
+from sqlitestore import SQLiteStore
+
+
+class SQLiteStoreImportTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.database = os.path.join(self.tmp.name, 'htbbot.db')
+        self.participants = os.path.join(self.tmp.name, 'participants.json')
+        self.claimed = os.path.join(self.tmp.name, 'claimed.json')
+        with open(self.participants, 'w') as f:
+            json.dump({'a@example.com': {'id': 'HTB1', 'name': 'A', 'password': 'pw'}}, f)
+        with open(self.claimed, 'w') as f:
+            json.dump({'HTB1': '111'}, f)
+
+    def boot(self, action):
+        async def run():
+            file_io = FileIO()
+            store = SQLiteStore(self.database, file_io, self.participants, self.claimed)
+            try:
+                await store.load_roster()
+                claims = await store.load_claims()
+                return await action(store, claims)
+            finally:
+                await file_io.close()
+                store.close()
+
+        return asyncio.run(run())
+
+    def test_cleared_claims_stay_cleared_after_restart(self):
+        async def clear(store, claims):
+            self.assertEqual(claims, {'HTB1': '111'})
+            await store.record_unclaim(list(claims))
+
+        async def claims_after_restart(store, claims):
+            return claims
+
+        self.boot(clear)
+        self.assertEqual(self.boot(claims_after_restart), {})
+
+    def test_roster_edited_while_down_is_applied_on_restart(self):
+        async def noop(store, claims):
+            pass
+
+        async def get_after_restart(store, claims):
+            return await store.get('HTB2')
+
+        self.boot(noop)
+        with open(self.participants, 'w') as f:
+            json.dump({'a@example.com': {'id': 'HTB1', 'name': 'A', 'password': 'pw'},
+                       'b@example.com': {'id': 'HTB2', 'name': 'B', 'password': 'pw2'}}, f)
+        self.assertEqual(self.boot(get_after_restart), {'email': 'b@example.com', 'name': 'B', 'password': 'pw2'})
+
+
+if __name__ == '__main__':
+    unittest.main()
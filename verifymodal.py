@@ -0,0 +1,41 @@
+# Copyright (c) 2025, Arka Mondal. All rights reserved.
+# Use of this source code is governed by a BSD-style license that
+# can be found in the LICENSE file.
+
+import discord
+
+
+class VerifyModal(discord.ui.Modal, title='Verify'):
+    """Asks for the participant id and passkey without either showing in chat.
+
+    ``submit(interaction, id, passkey)`` is awaited with the values once the
+    member sends the form.
+    """
+
+    htbid = discord.ui.TextInput(label='Participant ID', placeholder='HTB202503XXXX', max_length=64)
+    passkey = discord.ui.TextInput(label='Passkey', max_length=128)
+
+    def __init__(self, submit):
+        super().__init__(timeout=300)
+        self.submit = submit
+
+    async def on_submit(self, interaction):
+        await self.submit(interaction, self.htbid.value.strip(), self.passkey.value.strip())
+
+
+class ModalContext:
+    """The part of a command context verification uses, for a modal submit.
+
+    A submitted modal has no command, so discord.py cannot build a context
+    for it. Replies go out as ephemeral followups of the deferred
+    interaction.
+    """
+
+    def __init__(self, interaction):
+        self.interaction = interaction
+        self.guild = interaction.guild
+        self.channel = interaction.channel
+        self.author = interaction.user
+
+    async def send(self, content=None, **kwargs):
+        return await self.interaction.followup.send(content, ephemeral=True, **kwargs)
@@ -0,0 +1,207 @@
+# Copyright (c) 2025, Arka Mondal. All rights reserved.
+# Use of this source code is governed by a BSD-style license that
+# can be found in the LICENSE file.
+
+import asyncio
+import time
+from collections import deque
+
+
+class TokenBucket:
+    """Allows ``burst`` actions at once, refilled at ``rate`` per second."""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated = time.monotonic()
+
+    def take(self):
+        """Take a token; return 0 on success, else seconds until one is available."""
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return 0
+        return (1 - self._tokens) / self.rate
+
+
+class QueueBusy(Exception):
+    """A verification was turned away; the message is meant for the user."""
+
+    def __init__(self, message, retry_after=0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class VerifyQueue:
+    """Runs verifications on ``workers`` tasks, taking users in turn.
+
+    Each user may have ``per_user`` verifications waiting or running, runs
+    them one at a time, and may submit them at ``user_rate`` (a
+    ``(rate, burst)`` pair). Waiting users are
+    served round-robin, so one user cannot crowd out the rest, and each
+    guild starts at most ``guild_rate`` verifications, which keeps its role
+    grants under Discord's rate limit. At most ``max_pending``
+    verifications wait in total.
+    """
+
+    def __init__(self, workers=4, max_pending=256, per_user=1, user_rate=(0.2, 3), guild_rate=(5, 10)):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.per_user = per_user
+        self.user_rate = user_rate
+        self.guild_rate = guild_rate
+        self.pending = 0
+        self._queues = {}
+        # users whose verification is running; they rejoin the turns when it ends
+        self._running = set()
+        self._turns = deque()
+        self._user_buckets = {}
+        self._guild_buckets = {}
+        self._ready = asyncio.Semaphore(0)
+        self._tasks = []
+
+    def start(self):
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def submit(self, guild_id, user_id, work):
+        """Queue ``work()`` (a coroutine function) for ``user_id``; return its future.
+
+        Raises QueueBusy if the user or the queue is over its limit.
+        """
+        queue = self._queues.get(user_id)
+        queued = len(queue) if queue is not None else 0
+        if queued + (user_id in self._running) >= self.per_user:
+            raise QueueBusy('Your previous verification is still being processed.')
+        if self.pending >= self.max_pending:
+            raise QueueBusy('Verification is busy right now. Try again in a minute.', 60)
+
+        bucket = self._user_buckets.get(user_id)
+        if bucket is None:
+            bucket = self._user_buckets[user_id] = TokenBucket(*self.user_rate)
+        retry_after = bucket.take()
+        if retry_after:
+            raise QueueBusy(f'Slow down! Try again in {int(retry_after) + 1} seconds.', retry_after)
+
+        future = asyncio.get_running_loop().create_future()
+        if queue is None:
+            queue = self._queues[user_id] = deque()
+            if user_id not in self._running:
+                self._take_turn(user_id)
+        queue.append((guild_id, work, future))
+        self.pending += 1
+        return future
+
+    def _take_turn(self, user_id):
+        self._turns.append(user_id)
+        self._ready.release()
+
+    async def _worker(self):
+        while True:
+            await self._ready.acquire()
+            user_id = self._turns.popleft()
+            queue = self._queues[user_id]
+            guild_id, work, future = queue.popleft()
+            if not queue:
+                del self._queues[user_id]
+            self.pending -= 1
+            self._running.add(user_id)
+            try:
+                await self._run(guild_id, work, future)
+            finally:
+                self._running.discard(user_id)
+                if user_id in self._queues:
+                    self._take_turn(user_id)
+            self._forget_idle_buckets()
+
+    async def _run(self, guild_id, work, future):
+        bucket = self._guild_buckets.get(guild_id)
+        if bucket is None:
+            bucket = self._guild_buckets[guild_id] = TokenBucket(*self.guild_rate)
+        while wait := bucket.take():
+            await asyncio.sleep(wait)
+
+        if future.cancelled():
+            return
+        try:
+            result = await work()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            if not future.done():
+                future.set_exception(e)
+        else:
+            if not future.done():
+                future.set_result(result)
+
+    def _forget_idle_buckets(self):
+        # a full bucket is the same as a new one, drop it to bound memory
+        if len(self._user_buckets) > 4 * self.max_pending:
+            now = time.monotonic()
+            for user_id, bucket in list(self._user_buckets.items()):
+                if bucket._tokens + (now - bucket._updated) * bucket.rate >= bucket.burst:
+                    del self._user_buckets[user_id]
+
+
+class RoleGrants:
+    """Coalesces role grants per member and paces them per guild.
+
+    Grants requested for a member while an earlier grant is waiting are
+    folded into the same ``add_roles`` call; each guild sends at most one
+    call every ``interval`` seconds.
+    """
+
+    def __init__(self, interval=0.25):
+        self.interval = interval
+        self.calls = 0
+        self.coalesced = 0
+        self._waiting = {}
+        self._lanes = {}
+
+    async def grant(self, member, role):
+        key = (member.guild.id, member.id)
+        entry = self._waiting.get(key)
+        if entry is not None:
+            entry[1].append(role)
+            self.coalesced += 1
+            await asyncio.shield(entry[2])
+            return
+
+        done = asyncio.get_running_loop().create_future()
+        # nobody may be waiting on it, keep an unawaited failure quiet
+        done.add_done_callback(lambda f: f.cancelled() or f.exception())
+        entry = self._waiting[key] = (member, [role], done)
+        lane = self._lanes.get(member.guild.id)
+        if lane is None:
+            lane = self._lanes[member.guild.id] = asyncio.Lock()
+
+        try:
+            await lane.acquire()
+        except asyncio.CancelledError:
+            del self._waiting[key]
+            done.cancel()
+            raise
+
+        # from here on the entry is taken, later grants start a new one
+        del self._waiting[key]
+        try:
+            await member.add_roles(*{role.id: role for role in entry[1]}.values())
+            self.calls += 1
+        except asyncio.CancelledError:
+            done.cancel()
+            raise
+        except Exception as e:
+            done.set_exception(e)
+            raise
+        finally:
+            asyncio.get_running_loop().call_later(self.interval, lane.release)
+        done.set_result(None)